@@ -0,0 +1,125 @@
+import sys
+import time
+import cv2
+import numpy as np
+
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.card_extractor import CardExtractor
+
+
+"""
+Stress benchmark of CardExtractor._extract_boxes on busy backgrounds.
+
+The images of data/img_test are tiled onto synthetic backgrounds (noise, checkered and
+striped "tablecloths", tiles with nested borders) that produce thousands of contours. For each background, the script
+reports the number of contours, the number of boxes found and the time of:
+- the legacy extraction (no bounding-rect rejection, quadratic parent filtering),
+- the current CardExtractor._extract_boxes.
+
+Usage: python scripts/benchmark_card_extractor.py
+"""
+DATA_DIR = Path(__file__).parent.parent / 'data'
+CANVAS_SIZE = (2160, 3840)
+NUM_RUNS = 3
+
+
+# Previous implementation, kept here as the baseline of the benchmark.
+def legacy_extract_boxes(mask):
+    contours, hierarchy = cv2.findContours(mask.copy(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    debug_contours_all = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR).copy()
+    cv2.drawContours(debug_contours_all, contours, -1, (0, 255, 0), 1)
+
+    h, w = mask.shape[:2]
+    min_area = w * h * 0.01
+    max_area = w * h * 0.80
+
+    candidates = []
+    for i, cnt in enumerate(contours):
+        area = cv2.contourArea(cnt)
+        if area > max_area or area < min_area:
+            continue
+        peri = cv2.arcLength(cnt, True)
+        for e in [0.01, 0.02, 0.03, 0.05]:
+            approx = cv2.approxPolyDP(cnt, e * peri, True)
+            if len(approx) == 4 and cv2.isContourConvex(approx):
+                candidates.append((i, approx))
+                break
+
+    card_boxes = []
+    for i, approx in candidates:
+        parent_idx = hierarchy[0][i][3]
+        keep = True
+        while parent_idx != -1:
+            if any(parent_idx == candidate[0] for candidate in candidates):
+                keep = False
+                break
+            parent_idx = hierarchy[0][parent_idx][3]
+        if keep:
+            card_boxes.append(approx)
+    return card_boxes, len(contours)
+
+
+# Build a synthetic background of the given kind.
+def make_background(kind, rng):
+    h, w = CANVAS_SIZE
+    if kind == 'noise':
+        return rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    if kind == 'checkered':
+        yy, xx = np.mgrid[0:h, 0:w]
+        pattern = (((yy // 24) + (xx // 24)) % 2 * 120 + 60).astype(np.uint8)
+        return cv2.merge([pattern, pattern // 2 + 40, pattern]) + rng.integers(0, 40, (h, w, 3), dtype=np.uint8)
+    if kind == 'striped':
+        xx = np.arange(w)
+        pattern = np.tile(((np.sin(xx / 6.0) > 0) * 150 + 50).astype(np.uint8), (h, 1))
+        return cv2.merge([pattern, pattern, pattern // 3]) + rng.integers(0, 30, (h, w, 3), dtype=np.uint8)
+    if kind == 'tiles':
+        # Large tiles with concentric borders: many nested quadrilateral candidates.
+        yy, xx = np.mgrid[0:h, 0:w]
+        d = np.minimum(np.minimum(yy % 480, 479 - yy % 480), np.minimum(xx % 480, 479 - xx % 480))
+        pattern = ((d // 12) % 2 * 140 + 50).astype(np.uint8)
+        return cv2.merge([pattern, pattern, pattern]) + rng.integers(0, 30, (h, w, 3), dtype=np.uint8)
+    raise ValueError(kind)
+
+
+# Paste the test images (downscaled) onto the background in a grid.
+def tile_images(background, images):
+    h, w = background.shape[:2]
+    cols = 4
+    cell_w = w // cols
+    cell_h = h // 2
+    canvas = background.copy()
+    for k, img in enumerate(images):
+        r, c = divmod(k, cols)
+        scale = min((cell_w - 40) / img.shape[1], (cell_h - 40) / img.shape[0])
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        y, x = r * cell_h + 20, c * cell_w + 20
+        canvas[y:y + small.shape[0], x:x + small.shape[1]] = small
+    return canvas
+
+
+# Mean time in ms of fn() over NUM_RUNS runs, with its last result.
+def timed(fn):
+    result = None
+    t0 = time.perf_counter()
+    for _ in range(NUM_RUNS):
+        result = fn()
+    return (time.perf_counter() - t0) / NUM_RUNS * 1000, result
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    images = [cv2.imread(str(p)) for p in sorted((DATA_DIR / 'img_test').glob('*.jpg'))]
+
+    for kind in ['noise', 'checkered', 'striped', 'tiles']:
+        frame = tile_images(make_background(kind, rng), images[:4] if kind == 'tiles' else images)
+        extractor = CardExtractor(frame)
+        mask = extractor._preprocess()
+
+        legacy_ms, (legacy_boxes, num_contours) = timed(lambda: legacy_extract_boxes(mask))
+        new_ms, boxes = timed(lambda: extractor._extract_boxes(mask))
+
+        print(f'{kind:<10}: {num_contours} contours | legacy {legacy_ms:7.1f} ms, {len(legacy_boxes)} boxes '
+              f'| current {new_ms:7.1f} ms, {len(boxes)} boxes | x{legacy_ms / new_ms:.1f}')
@@ -0,0 +1,95 @@
+import sys
+import time
+import numpy as np
+
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.card_extractor import CardExtractor
+from src.card_recognizer import CardRecognizer
+
+
+"""
+Accuracy parity and latency of the embedding backends of CardRecognizer.
+
+Each backend (eager torch, TorchScript, ONNX Runtime float32 and int8) builds the reference
+embeddings of ref_dir from scratch (no feature cache). The script reports:
+- the cosine similarity between its reference embeddings and the eager torch ones,
+- the top-1 accuracy of the full recognizer on the cards of data/img_test,
+- the top-1 agreement of the embedding search alone with the eager torch one,
+- the mean latency of one forward pass on a batch of cards (and per card).
+
+Exported models are written to data/models (delete the folder to export them again).
+
+Usage: python scripts/benchmark_embedding_backends.py [ref_dir]
+"""
+DATA_DIR = Path(__file__).parent.parent / 'data'
+REF_DIR = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR / 'cards_test'
+NUM_RUNS = 10
+BACKENDS = [('torch', False), ('torchscript', False), ('onnx', False), ('onnx', True)]
+EXPECTED_CARDS = {
+    'img1.jpg': ['p_r', 'co_9'],
+    'img2.jpg': ['t_9', 'co_10', 'co_r', 't_7', 'co_d'],
+    'img3.jpg': ['t_10', 'p_10', 'p_7', 'ca_d'],
+    'img4.jpg': ['t_v'],
+    'img5.jpg': ['t_7', 'ca_a', 'p_v'],
+    'img6.jpg': ['p_v', 'p_d', 'co_a', 't_6'],
+    'img7.jpg': ['p_10', 'ca_7', 'ca_v', 'p_r', 'ca_r'],
+}
+
+
+# Top-1 accuracy of the recognizer on the test images (predicted and expected labels compared as multisets).
+def accuracy(recognizer, images_per_file):
+    correct = total = 0
+    for filename, images in images_per_file.items():
+        predicted = [r[0][0] if r else None for r in recognizer.recognize_batch(images)]
+        expected = list(EXPECTED_CARDS[filename])
+        for label in predicted:
+            if label in expected:
+                expected.remove(label)
+                correct += 1
+        total += len(EXPECTED_CARDS[filename])
+    return correct / total
+
+
+# Mean time in ms of one forward pass of the backend on the preprocessed batch.
+def latency(recognizer, batch):
+    recognizer.backend(batch)
+    t0 = time.perf_counter()
+    for _ in range(NUM_RUNS):
+        recognizer.backend(batch)
+    return (time.perf_counter() - t0) / NUM_RUNS * 1000
+
+
+if __name__ == '__main__':
+    images_per_file = {
+        img_path.name: [card.image for card in CardExtractor.from_file(str(img_path)).get_cards()]
+        for img_path in sorted((DATA_DIR / 'img_test').glob('*.jpg'))
+    }
+    all_images = [image for images in images_per_file.values() for image in images]
+
+    reference = None
+    for backend, quantize in BACKENDS:
+        name = f'{backend}{" int8" if quantize else ""}'
+        try:
+            t0 = time.perf_counter()
+            recognizer = CardRecognizer(REF_DIR, use_cache=False, backend=backend, quantize=quantize)
+            init_s = time.perf_counter() - t0
+        except ImportError as e:
+            print(f'{name:<16}: skipped ({e})')
+            continue
+
+        batch = recognizer._preprocess_batch(all_images)
+        batch_ms = latency(recognizer, batch)
+        single_ms = latency(recognizer, batch[:1])
+        top1 = (recognizer.ref_embeddings @ recognizer._imgs_to_embeddings(all_images).T).argmax(axis=0)
+
+        if reference is None:
+            reference = recognizer.ref_embeddings, top1
+        cosine = np.sum(recognizer.ref_embeddings * reference[0], axis=1)
+
+        print(f'{name:<16}: init {init_s:5.2f} s | cosine vs torch min {cosine.min():.4f} / mean {cosine.mean():.4f} '
+              f'| embedding top-1 agreement {np.mean(top1 == reference[1]):.0%} '
+              f'| accuracy {accuracy(recognizer, images_per_file):.0%} '
+              f'| batch of {len(batch)}: {batch_ms:6.1f} ms ({batch_ms / len(batch):5.2f} ms/card), single card {single_ms:5.1f} ms')
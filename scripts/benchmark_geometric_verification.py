@@ -0,0 +1,57 @@
+import sys
+import cv2
+import time
+import numpy as np
+
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.evaluate_embeddings import distort
+from src.card_recognizer import CardRecognizer
+
+
+"""
+Ratio-test scoring vs RANSAC homography inlier scoring in the SIFT reranker.
+
+Distorted copies of the reference images of ref_dir (see scripts/evaluate_embeddings.py) are
+recognized with several configurations (scoring, nfeatures, number of candidates, early stop).
+The script reports the top-1 accuracy, the mean margin between the best and the second best
+SIFT score (in % of query keypoints) and the mean recognition time per card.
+
+Usage: python scripts/benchmark_geometric_verification.py [ref_dir]
+"""
+DATA_DIR = Path(__file__).parent.parent / 'data'
+REF_DIR = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR / 'cards_test'
+QUERIES_PER_CARD = 2
+CONFIGS = [
+    dict(geometric_verification=False, nfeatures=5000, num_candidates=6),
+    dict(geometric_verification=True, nfeatures=5000, num_candidates=6),
+    dict(geometric_verification=True, nfeatures=1000, num_candidates=4),
+    dict(geometric_verification=True, nfeatures=1000, num_candidates=4, early_stop_inliers=15),
+    dict(geometric_verification=True, nfeatures=500, num_candidates=3, early_stop_inliers=12),
+]
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    images, labels = [], []
+    for img_path in sorted(list(REF_DIR.glob('*.jpg')) + list(REF_DIR.glob('*.png'))):
+        img = cv2.imread(str(img_path))
+        for _ in range(QUERIES_PER_CARD):
+            images.append(distort(img, rng))
+            labels.append(img_path.stem)
+    print(f'{len(images)} queries from {REF_DIR}')
+
+    for config in CONFIGS:
+        recognizer = CardRecognizer(REF_DIR, use_cache=False, **config)
+        recognizer.recognize(images[0])
+
+        t0 = time.perf_counter()
+        results = [recognizer.recognize(img, top_k=2) for img in images]
+        card_ms = (time.perf_counter() - t0) / len(images) * 1000
+
+        accuracy = np.mean([bool(r) and r[0][0] == label for r, label in zip(results, labels)])
+        margin = np.mean([r[0][1] - (r[1][1] if len(r) > 1 else 0) for r in results if r])
+        name = ', '.join(f'{k}={v}' for k, v in config.items())
+        print(f'{name:<95}: top-1 {accuracy:5.1%} | score margin {margin:5.1f} | {card_ms:6.1f} ms/card')
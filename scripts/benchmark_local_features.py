@@ -0,0 +1,87 @@
+import sys
+import cv2
+import time
+import tracemalloc
+import numpy as np
+
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.evaluate_embeddings import distort
+from src.card_recognizer import CardRecognizer
+
+
+"""
+Memory and latency of the local feature backends of CardRecognizer (features='sift', 'orb', 'akaze').
+
+For each backend, the reference features of ref_dir are computed from scratch (no cache), then
+distorted copies of the reference images (see scripts/evaluate_embeddings.py) are recognized.
+The script reports:
+- the memory of the reference features: descriptors + (N, 6) keypoint arrays, per card, and
+  what the same keypoints would cost as lists of cv2.KeyPoint objects,
+- the feature extraction time per card and the reranking time per card (shortlist matching,
+  brute force and FLANN),
+- the top-1 accuracy of the full recognizer.
+
+Usage: python scripts/benchmark_local_features.py [ref_dir]
+"""
+DATA_DIR = Path(__file__).parent.parent / 'data'
+REF_DIR = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR / 'cards_test'
+QUERIES_PER_CARD = 2
+NUM_CANDIDATES = 6
+
+
+# Python heap size in bytes of the reference keypoints stored as lists of cv2.KeyPoint.
+def keypoint_objects_size(ref_sift):
+    tracemalloc.start()
+    lists = [[cv2.KeyPoint(float(x), float(y), float(s), float(a), float(r), int(o)) for x, y, s, a, r, o in kp]
+             for kp, _ in ref_sift]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del lists
+    return size
+
+
+# Mean reranking time in ms per card over a fixed embedding shortlist.
+def rerank_ms(recognizer, queries):
+    t0 = time.perf_counter()
+    for kp, desc, candidates in queries:
+        [recognizer._sift_score(kp, desc, idx) for idx in candidates]
+    return (time.perf_counter() - t0) / len(queries) * 1000
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    images, labels = [], []
+    for img_path in sorted(list(REF_DIR.glob('*.jpg')) + list(REF_DIR.glob('*.png'))):
+        img = cv2.imread(str(img_path))
+        for _ in range(QUERIES_PER_CARD):
+            images.append(distort(img, rng))
+            labels.append(img_path.stem)
+    print(f'{len(images)} queries from {REF_DIR}')
+
+    for features in ['sift', 'orb', 'akaze']:
+        recognizer = CardRecognizer(REF_DIR, use_cache=False, features=features)
+        num_refs = len(recognizer.ref_labels)
+        desc_bytes = sum(desc.nbytes for _, desc in recognizer.ref_sift)
+        kp_bytes = sum(kp.nbytes for kp, _ in recognizer.ref_sift)
+        num_kp = sum(len(kp) for kp, _ in recognizer.ref_sift) / num_refs
+
+        t0 = time.perf_counter()
+        query_features = [recognizer._img_to_sift(img) for img in images]
+        extract_ms = (time.perf_counter() - t0) / len(images) * 1000
+
+        scores, _ = recognizer._embedding_scores(recognizer._imgs_to_embeddings(images))
+        queries = [(kp, desc, np.argsort(-scores[:, i])[:NUM_CANDIDATES]) for i, (kp, desc) in enumerate(query_features)]
+        bf_ms = rerank_ms(recognizer, queries)
+        recognizer.ref_matchers = recognizer._build_flann_matchers()
+        flann_ms = rerank_ms(recognizer, queries)
+        recognizer.ref_matchers = None
+
+        predictions = [r[0][0] if r else None for r in recognizer.recognize_batch(images)]
+        accuracy = np.mean([p == l for p, l in zip(predictions, labels)])
+
+        print(f'{features:<6}: {num_kp:6.0f} kp/card | descriptors {desc_bytes / num_refs / 1e6:5.2f} MB/card, '
+              f'keypoints {kp_bytes / num_refs / 1e3:6.1f} kB/card (as cv2.KeyPoint: {keypoint_objects_size(recognizer.ref_sift) / num_refs / 1e3:6.1f} kB) '
+              f'| extract {extract_ms:6.1f} ms/card, rerank bf {bf_ms:6.1f} / flann {flann_ms:6.1f} ms/card | top-1 {accuracy:.0%}')
@@ -0,0 +1,59 @@
+import os
+import sys
+import cv2
+import time
+
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.card_extractor import CardExtractor
+from src.card_recognizer import CardRecognizer
+
+
+"""
+Sweep of the recognition thread budgets.
+
+For each combination of SIFT workers (cards of a frame processed concurrently), embedding
+threads (torch intra-op threads) and OpenCV threads, the script recognizes the cards of every
+image of data/img_test with recognize_batch (one call per frame) and reports the mean time per
+frame and per card. Pick the fastest combination whose total thread count does not exceed the
+cores left to the rest of the app.
+
+Usage: python scripts/benchmark_recognition_threads.py [ref_dir]
+"""
+DATA_DIR = Path(__file__).parent.parent / 'data'
+REF_DIR = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR / 'cards_test'
+NUM_RUNS = 3
+NUM_CORES = os.cpu_count() or 1
+COUNTS = sorted({1, 2, 4, NUM_CORES})
+
+
+# Mean time in ms per frame and per card of recognize_batch over all frames.
+def time_frames(recognizer, frames):
+    recognizer.recognize_batch(frames[0])
+    t0 = time.perf_counter()
+    for _ in range(NUM_RUNS):
+        for images in frames:
+            recognizer.recognize_batch(images, min_score=0.75)
+    elapsed = (time.perf_counter() - t0) * 1000 / NUM_RUNS
+    return elapsed / len(frames), elapsed / sum(len(images) for images in frames)
+
+
+if __name__ == '__main__':
+    frames = [
+        [card.image for card in CardExtractor.from_file(str(img_path)).get_cards()]
+        for img_path in sorted((DATA_DIR / 'img_test').glob('*.jpg'))
+    ]
+    print(f'{NUM_CORES} cores, {len(frames)} frames, {sum(len(f) for f in frames)} cards')
+
+    for opencv_threads in sorted({1, NUM_CORES}):
+        cv2.setNumThreads(opencv_threads)
+        for embedding_threads in COUNTS:
+            for sift_workers in COUNTS:
+                recognizer = CardRecognizer(REF_DIR, sift_workers=sift_workers, embedding_threads=embedding_threads)
+                frame_ms, card_ms = time_frames(recognizer, frames)
+                print(f'opencv {opencv_threads:>2} | embedding {embedding_threads:>2} | sift workers {sift_workers:>2}: '
+                      f'{frame_ms:7.1f} ms/frame, {card_ms:6.1f} ms/card')
+                if recognizer.executor is not None:
+                    recognizer.executor.shutdown()
@@ -0,0 +1,69 @@
+import sys
+import time
+import numpy as np
+
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.card_extractor import CardExtractor
+from src.card_recognizer import CardRecognizer
+
+
+"""
+Benchmark of the SIFT reranking step with the brute-force and the FLANN matcher backends.
+
+For every card extracted from data/img_test, the query SIFT features are computed once, then
+each backend scores the same embedding shortlist. The script reports the mean reranking time
+per card, the speedup over brute force, the top-1 agreement and the score differences.
+
+Usage: python scripts/benchmark_sift_matcher.py [ref_dir]
+"""
+DATA_DIR = Path(__file__).parent.parent / 'data'
+REF_DIR = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR / 'cards_test'
+NUM_CANDIDATES = 6
+NUM_RUNS = 5
+FLANN_CONFIGS = [(1, 16), (1, 32), (2, 64), (4, 64), (4, 128)]
+
+
+# Score the shortlist of every query and return (mean ms per card, scores).
+def rerank_all(recognizer, queries):
+    scores = []
+    t0 = time.perf_counter()
+    for _ in range(NUM_RUNS):
+        scores = []
+        for kp, desc, candidates in queries:
+            scores.append([recognizer._sift_score(kp, desc, idx) for idx in candidates])
+    elapsed = (time.perf_counter() - t0) / NUM_RUNS / len(queries)
+    return elapsed * 1000, np.array(scores)
+
+
+if __name__ == '__main__':
+    recognizer = CardRecognizer(REF_DIR)
+
+    queries = []
+    for img_path in sorted((DATA_DIR / 'img_test').glob('*.jpg')):
+        for card in CardExtractor.from_file(str(img_path)).get_cards():
+            scores = (recognizer.ref_embeddings @ recognizer._img_to_embedding(card.image)).ravel()
+            candidates = np.argsort(-scores)[:NUM_CANDIDATES]
+            kp, desc = recognizer._img_to_sift(card.image)
+            queries.append((kp, desc, candidates))
+
+    bf_ms, bf_scores = rerank_all(recognizer, queries)
+    print(f'{len(queries)} cards, {NUM_CANDIDATES} candidates per card')
+    print(f'{"bf":<24}: {bf_ms:6.2f} ms/card')
+
+    for trees, checks in FLANN_CONFIGS:
+        recognizer.flann_trees, recognizer.flann_checks = trees, checks
+        t0 = time.perf_counter()
+        recognizer.ref_matchers = recognizer._build_flann_matchers()
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        flann_ms, flann_scores = rerank_all(recognizer, queries)
+        recognizer.ref_matchers = None
+
+        agreement = np.mean(bf_scores.argmax(axis=1) == flann_scores.argmax(axis=1))
+        diff = np.abs(bf_scores - flann_scores)
+        print(f'{f"flann trees={trees} checks={checks}":<24}: {flann_ms:6.2f} ms/card '
+              f'(x{bf_ms / flann_ms:.2f}, index build {build_ms:.0f} ms), '
+              f'top-1 agreement {agreement:.0%}, score diff max {diff.max():.2f} / mean {diff.mean():.3f}')
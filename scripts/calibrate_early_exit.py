@@ -0,0 +1,68 @@
+import sys
+import cv2
+import numpy as np
+
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.evaluate_embeddings import distort
+from src.card_recognizer import CardRecognizer
+
+
+"""
+Calibration of CardRecognizer(early_exit_margin=...).
+
+Distorted copies of the reference images of ref_dir (see scripts/evaluate_embeddings.py) are
+recognized with the full SIFT reranking. For each query, the embedding margin (top-1 score minus
+the best score of another label) is compared with the correctness of the embedding top-1.
+The recommended threshold is just above the largest margin of a wrong embedding top-1, so that
+the cascade makes no error on the calibration set. The script reports, for this threshold and a
+few others, the fraction of SIFT calls saved and the top-1 accuracy of the cascade.
+
+Usage: python scripts/calibrate_early_exit.py [ref_dir]
+"""
+DATA_DIR = Path(__file__).parent.parent / 'data'
+REF_DIR = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR / 'cards_test'
+QUERIES_PER_CARD = 5
+THRESHOLDS = [0.02, 0.05, 0.1, 0.15, 0.2, 0.3]
+EPSILON = 0.01
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(1)
+    recognizer = CardRecognizer(REF_DIR)
+
+    images, labels = [], []
+    for img_path in recognizer._reference_paths():
+        img = cv2.imread(str(img_path))
+        for _ in range(QUERIES_PER_CARD):
+            images.append(distort(img, rng))
+            labels.append(img_path.stem)
+    labels = np.array(labels)
+
+    scores, _ = recognizer._embedding_scores(recognizer._imgs_to_embeddings(images))
+    valid = np.arange(len(recognizer.ref_labels))
+
+    margins, embed_labels = [], []
+    for i in range(len(images)):
+        margin, order = recognizer._embedding_margin(scores[:, i], valid)
+        margins.append(margin)
+        embed_labels.append(recognizer.ref_labels[order[0]])
+    margins = np.array(margins)
+    embed_correct = np.array(embed_labels) == labels
+    sift_labels = np.array([r[0][0] if r else None for r in recognizer.recognize_batch(images)])
+    sift_correct = sift_labels == labels
+
+    wrong_margins = margins[~embed_correct]
+    recommended = round(float(wrong_margins.max()) + EPSILON if len(wrong_margins) else EPSILON, 3)
+
+    print(f'{len(images)} queries from {REF_DIR}: embedding top-1 {embed_correct.mean():.1%}, '
+          f'embedding + SIFT top-1 {sift_correct.mean():.1%}')
+    for threshold in sorted(set(THRESHOLDS + [recommended])):
+        exits = margins >= threshold
+        cascade_correct = np.where(exits, embed_correct, sift_correct)
+        early_accuracy = embed_correct[exits].mean() if exits.any() else float('nan')
+        print(f'margin >= {threshold:.3f}: {exits.mean():6.1%} SIFT calls saved, early-exit top-1 {early_accuracy:6.1%}, '
+              f'cascade top-1 {cascade_correct.mean():6.1%}{"  <- recommended" if threshold == recommended else ""}')
+    print(f'Set "early_exit_margin": {recommended} in data/settings.json to enable the cascade.')
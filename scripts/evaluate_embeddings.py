@@ -0,0 +1,87 @@
+import sys
+import time
+import cv2
+import numpy as np
+
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.card_recognizer import CardRecognizer
+
+
+"""
+Accuracy / throughput trade-off of the embedding backbones and input sizes of CardRecognizer.
+
+The queries are distorted copies of the reference images of ref_dir (perspective jitter,
+lighting change, blur, noise, half of them rotated by 180°), warped to the card size produced
+by CardExtractor, so every query has a known label. For each option the script reports:
+- top-1 / top-3 accuracy of the embedding search alone,
+- top-1 / top-3 accuracy of the full recognizer (embedding shortlist + SIFT reranking),
+- the embedding time per card (batched), in ms.
+
+Usage: python scripts/evaluate_embeddings.py [ref_dir]
+"""
+DATA_DIR = Path(__file__).parent.parent / 'data'
+REF_DIR = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR / 'cards_test'
+QUERIES_PER_CARD = 3
+CARD_SIZE = (300, 600)
+OPTIONS = [
+    ('resnet18', (224, 224)),
+    ('resnet18', (160, 160)),
+    ('resnet18', (112, 112)),
+    ('mobilenet_v3_small', (224, 224)),
+    ('mobilenet_v3_small', (160, 160)),
+    ('mobilenet_v3_small', (112, 112)),
+    ('hog_color', (128, 128)),
+    ('hog_color', (64, 128)),
+]
+
+
+# Distorted copy of a reference image, warped to the size of an extracted card.
+def distort(img, rng):
+    h, w = img.shape[:2]
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    src += rng.uniform(-0.04, 0.04, src.shape).astype(np.float32) * np.float32([w, h])
+    dst = np.float32([[0, 0], [CARD_SIZE[0], 0], [CARD_SIZE[0], CARD_SIZE[1]], [0, CARD_SIZE[1]]])
+    card = cv2.warpPerspective(img, cv2.getPerspectiveTransform(src, dst), CARD_SIZE, borderMode=cv2.BORDER_REPLICATE)
+
+    card = cv2.convertScaleAbs(card, alpha=rng.uniform(0.7, 1.3), beta=rng.uniform(-30, 30))
+    card = cv2.GaussianBlur(card, (5, 5), rng.uniform(0.1, 1.5))
+    card = cv2.add(card, rng.normal(0, 6, card.shape).astype(np.int16), dtype=cv2.CV_8U)
+    if rng.random() < 0.5:
+        card = cv2.rotate(card, cv2.ROTATE_180)
+    return card
+
+
+# Fraction of queries whose label is in the first k predictions.
+def top_k_accuracy(predictions, labels, k):
+    return np.mean([label in predicted[:k] for predicted, label in zip(predictions, labels)])
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    images, labels = [], []
+    for img_path in sorted(list(REF_DIR.glob('*.jpg')) + list(REF_DIR.glob('*.png'))):
+        img = cv2.imread(str(img_path))
+        for _ in range(QUERIES_PER_CARD):
+            images.append(distort(img, rng))
+            labels.append(img_path.stem)
+    print(f'{len(images)} queries from {REF_DIR}')
+
+    for backbone, input_size in OPTIONS:
+        recognizer = CardRecognizer(REF_DIR, use_cache=False, backbone=backbone, input_size=input_size)
+
+        recognizer._imgs_to_embeddings(images[:2])
+        t0 = time.perf_counter()
+        queries = recognizer._imgs_to_embeddings(images)
+        embed_ms = (time.perf_counter() - t0) / len(images) * 1000
+
+        scores, _ = recognizer._embedding_scores(queries)
+        embed_predictions = [list(recognizer.ref_labels[np.argsort(-s, kind='stable')[:3]]) for s in scores.T]
+        predictions = [[label for label, _ in r] for r in recognizer.recognize_batch(images, top_k=3)]
+
+        print(f'{backbone:<18} {input_size[0]:>3}x{input_size[1]:<3} ({recognizer.ref_embeddings.shape[1]:>4}-d): '
+              f'embedding top-1 {top_k_accuracy(embed_predictions, labels, 1):4.0%} / top-3 {top_k_accuracy(embed_predictions, labels, 3):4.0%} '
+              f'| with SIFT top-1 {top_k_accuracy(predictions, labels, 1):4.0%} / top-3 {top_k_accuracy(predictions, labels, 3):4.0%} '
+              f'| {embed_ms:6.2f} ms/card')
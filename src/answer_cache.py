@@ -0,0 +1,107 @@
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+from typing import Union
+from pathlib import Path
+
+from src.query_cache import normalize_question
+from src.utils import project_root
+
+
+class AnswerCache:
+    """
+    Persistent (SQLite) cache of the answers of TarotQuestions, stored in data/cache/answers.sqlite.
+
+    An answer only holds for a given context: the ids of the retrieved chunks, the model name and the
+    prompts (see context_key()). Within a context, an answer is found:
+    - exactly, by normalized question (see normalize_question), or
+    - for a paraphrase, when the question embedding has a cosine similarity >= similarity with the
+      embedding of a cached question.
+    At most max_entries answers are kept; the least recently used ones are evicted first.
+    """
+
+    # Recency is a logical clock stored in the database (no ties, unlike wall clock timestamps).
+    NEXT_USE = 'SELECT COALESCE(MAX(last_used), 0) + 1 FROM answers'
+
+    # Open (or create) the cache database.
+    def __init__(self, path: Union[str, Path, None] = None, max_entries: int = 1000, similarity: float = 0.93):
+        if path is None:
+            path = project_root() / 'data' / 'cache' / 'answers.sqlite'
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.similarity = similarity
+
+        # Answers are looked up from the question worker threads.
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        with self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY, context_key TEXT NOT NULL, question TEXT NOT NULL,
+                embedding BLOB NOT NULL, answer TEXT NOT NULL, last_used INTEGER NOT NULL)""")
+            self.db.execute('CREATE INDEX IF NOT EXISTS answers_context ON answers (context_key)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)')
+
+    # Key of the context an answer depends on: retrieved chunk ids (in order), model name and prompt hash.
+    @staticmethod
+    def context_key(chunk_ids, model_name: str, prompt_hash: str) -> str:
+        return hashlib.sha256('\n'.join([model_name, prompt_hash, *chunk_ids]).encode('utf-8')).hexdigest()
+
+    # Exact key of a question in a context.
+    @staticmethod
+    def _key(question: str, context_key: str) -> str:
+        return hashlib.sha256(f'{context_key}\n{normalize_question(question)}'.encode('utf-8')).hexdigest()
+
+    # Return the cached answer of the question (or of a paraphrase of it) in this context, or None.
+    def get(self, question: str, embedding, context_key: str):
+        key = self._key(question, context_key)
+        with self.lock:
+            row = self.db.execute('SELECT key, answer FROM answers WHERE key = ?', (key,)).fetchone()
+            if row is None and embedding is not None:
+                row = self._nearest(embedding, context_key)
+            if row is None:
+                return None
+            with self.db:
+                self.db.execute(f'UPDATE answers SET last_used = ({self.NEXT_USE}) WHERE key = ?', (row[0],))
+            return row[1]
+
+    # Most similar cached question of the context, if similar enough: (key, answer) or None.
+    def _nearest(self, embedding, context_key: str):
+        query = self._normalize(embedding)
+        rows = self.db.execute('SELECT key, answer, embedding FROM answers WHERE context_key = ?', (context_key,)).fetchall()
+        # Embeddings of another size come from another embedding model.
+        rows = [row for row in rows if len(row[2]) == query.nbytes]
+        if not rows:
+            return None
+        cached = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        scores = cached @ query
+        best = int(np.argmax(scores))
+        return rows[best][:2] if scores[best] >= self.similarity else None
+
+    # Store the answer of a question in a context, then evict the least recently used answers beyond max_entries.
+    def put(self, question: str, embedding, context_key: str, answer: str):
+        with self.lock, self.db:
+            self.db.execute(
+                f'INSERT OR REPLACE INTO answers (key, context_key, question, embedding, answer, last_used) VALUES (?, ?, ?, ?, ?, ({self.NEXT_USE}))',
+                (self._key(question, context_key), context_key, normalize_question(question),
+                 self._normalize(embedding).tobytes(), answer))
+            self.db.execute(
+                'DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,))
+
+    # L2-normalized float32 copy of an embedding.
+    @staticmethod
+    def _normalize(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        return embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+    # Number of cached answers.
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM answers').fetchone()[0]
+
+    # Close the database.
+    def close(self):
+        with self.lock:
+            self.db.close()
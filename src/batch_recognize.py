@@ -0,0 +1,158 @@
+import os
+import sys
+import cv2
+import json
+import time
+import argparse
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from src.card_extractor import CardExtractor
+from src.card_recognizer import CardRecognizer
+from src.utils import project_root
+
+
+# Recognizer of the current worker process (set by BatchRecognizer._init_worker).
+_worker_recognizer = None
+
+
+class BatchRecognizer:
+    """
+    Headless recognition of a whole folder of photographed spreads (no camera, audio or LLM).
+
+    The images are streamed through CardExtractor + CardRecognizer by a pool of worker processes.
+    Each worker builds its CardRecognizer once, from the reference feature cache that the parent
+    process fills beforehand, then handles images one by one. One JSON object per image is written
+    as soon as it is available (in input order):
+        {"image": ..., "cards": [{"box": [[x, y] x4], "label": ..., "score": ..., "source": ..., "matches": [[label, score], ...]}],
+         "timings_ms": {"read": ..., "extract": ..., "recognize": ..., "total": ...}}
+    "source" sets the scale of the card scores (see CardRecognizer.recognize_batch).
+    Images that cannot be read or processed get an "error" field instead of "cards".
+
+    Usage: uv run python -m src.batch_recognize <image_dir> [--ref-dir data/cards] [--workers N] [--output results.jsonl]
+    """
+
+    IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+    # Store the recognition parameters; recognizer_kwargs are passed to CardRecognizer in every worker.
+    def __init__(self, ref_dir, num_workers: int = None, top_k: int = 3, min_score: float = None, detect_max_dim: int = None,
+                 recognizer_kwargs: dict = None):
+        self.ref_dir = Path(ref_dir)
+        self.num_workers = num_workers if num_workers is not None else (os.cpu_count() or 1)
+        self.top_k = top_k
+        self.min_score = min_score
+        self.detect_max_dim = detect_max_dim
+        # One embedding thread per worker: the processes already use every core. In-process, keep the default.
+        self.recognizer_kwargs = {'embedding_threads': 1 if self.num_workers > 0 else None, **(recognizer_kwargs or {})}
+
+    # List the images of a folder (recursively), sorted by path.
+    @classmethod
+    def image_paths(cls, image_dir):
+        return sorted(p for p in Path(image_dir).rglob('*') if p.suffix.lower() in cls.IMAGE_SUFFIXES)
+
+    # Worker process initializer: limit OpenCV threads and load the recognizer once.
+    @staticmethod
+    def _init_worker(ref_dir, recognizer_kwargs):
+        global _worker_recognizer
+        cv2.setNumThreads(1)
+        _worker_recognizer = CardRecognizer(ref_dir, **recognizer_kwargs)
+
+    # Extract and recognize the cards of one image with the worker recognizer; returns the JSON record.
+    @staticmethod
+    def _process_image(path, top_k, min_score, detect_max_dim):
+        record = {'image': str(path)}
+        t0 = time.perf_counter()
+        try:
+            img = cv2.imread(str(path))
+            if img is None:
+                raise ValueError('unreadable image')
+            t1 = time.perf_counter()
+            cards = CardExtractor(img, detect_max_dim=detect_max_dim).get_cards()
+            t2 = time.perf_counter()
+            results = _worker_recognizer.recognize_batch([card.image for card in cards], top_k=top_k, min_score=min_score,
+                                                         with_source=True)
+            t3 = time.perf_counter()
+        except Exception as e:
+            record['error'] = f'{type(e).__name__}: {e}'
+            return record
+
+        record['cards'] = [{
+            'box': card.box.reshape(-1, 2).round(1).tolist(),
+            'label': matches[0][0] if matches else None,
+            'score': round(float(matches[0][1]), 3) if matches else None,
+            'source': matches[0][2] if matches else None,
+            'matches': [[label, round(float(score), 3)] for label, score, _ in matches],
+        } for card, matches in zip(cards, results)]
+        record['timings_ms'] = {
+            'read': round((t1 - t0) * 1000, 2),
+            'extract': round((t2 - t1) * 1000, 2),
+            'recognize': round((t3 - t2) * 1000, 2),
+            'total': round((t3 - t0) * 1000, 2),
+        }
+        return record
+
+    # Compute the missing reference features into the cache, so that the workers only load it. The recognizer
+    # is dropped afterwards and keeps the default embedding threads (no process-wide torch thread change).
+    def _fill_cache(self):
+        CardRecognizer(self.ref_dir, **{**self.recognizer_kwargs, 'sift_workers': 1, 'embedding_threads': None})
+
+    # Recognize every image and yield the records in input order.
+    # With num_workers=0 everything runs in the calling process, with a single recognizer.
+    def run(self, paths):
+        paths = list(paths)
+        args = (self.top_k, self.min_score, self.detect_max_dim)
+        if self.num_workers == 0:
+            self._init_worker(self.ref_dir, self.recognizer_kwargs)
+            for path in paths:
+                yield self._process_image(path, *args)
+            return
+
+        self._fill_cache()
+        with ProcessPoolExecutor(self.num_workers, initializer=self._init_worker,
+                                 initargs=(self.ref_dir, self.recognizer_kwargs)) as executor:
+            futures = [executor.submit(self._process_image, path, *args) for path in paths]
+            for future in futures:
+                yield future.result()
+
+    # Recognize every image and write the records as JSON lines; returns summary counters.
+    def write_jsonl(self, paths, output):
+        stats = {'images': 0, 'cards': 0, 'errors': 0}
+        t0 = time.perf_counter()
+        for record in self.run(paths):
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+            stats['images'] += 1
+            stats['cards'] += len(record.get('cards', []))
+            stats['errors'] += 'error' in record
+        stats['seconds'] = round(time.perf_counter() - t0, 2)
+        return stats
+
+
+# Command line entry point.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recognize the cards of every image of a folder and write JSON lines.')
+    parser.add_argument('image_dir', type=Path)
+    parser.add_argument('--ref-dir', type=Path, default=project_root() / 'data' / 'cards')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count, 0: in-process)')
+    parser.add_argument('--output', type=Path, default=None, help='JSONL output file (default: stdout)')
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--min-score', type=float, default=None)
+    parser.add_argument('--detect-max-dim', type=int, default=None)
+    parser.add_argument('--backend', default='torch')
+    args = parser.parse_args(argv)
+
+    batch = BatchRecognizer(args.ref_dir, num_workers=args.workers, top_k=args.top_k, min_score=args.min_score,
+                            detect_max_dim=args.detect_max_dim, recognizer_kwargs={'backend': args.backend})
+    paths = BatchRecognizer.image_paths(args.image_dir)
+
+    if args.output is None:
+        stats = batch.write_jsonl(paths, sys.stdout)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            stats = batch.write_jsonl(paths, output)
+    print(f"{stats['images']} images, {stats['cards']} cards, {stats['errors']} errors in {stats['seconds']} s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,15 +11,26 @@ class Card():
         image: The extracted/warped card image (BGR).
         label: Optional predicted label (e.g., card name).
         confidence: Optional confidence score associated with the label.
+        reversed: Optional orientation: True if the card is upside down (reversed in a reading).
     """
 
     # Create a Card object from its corner box, extracted image, and optional prediction info.
-    def __init__(self, box, image, label=None, confidence=None):
+    def __init__(self, box, image, label=None, confidence=None, reversed=None):
         self.box = box
         self.image = image
         self.label = label
         self.confidence = confidence
+        self.reversed = reversed
     
+    # Compute the intersection over union of two convex quadrilateral boxes.
+    @staticmethod
+    def box_iou(box_a, box_b):
+        a = np.asarray(box_a, dtype=np.float32).reshape(-1, 2)
+        b = np.asarray(box_b, dtype=np.float32).reshape(-1, 2)
+        inter, _ = cv2.intersectConvexConvex(a, b)
+        union = cv2.contourArea(a) + cv2.contourArea(b) - inter
+        return inter / union if union > 0 else 0.0
+
     # Draw the card box and label on the given image.
     def draw_on(self, img, color=(0, 255, 0), thickness=2):
         pts = self.box.reshape(-1, 1, 2).astype(np.int32)
@@ -30,6 +41,8 @@ class Card():
                 text = f'{self.label} ({self.confidence:.2f})'
             else:
                 text = self.label
+            if self.reversed:
+                text += ' [R]'
 
             x, y, _, _ = cv2.boundingRect(pts)
             text_y = max(0, y - 10)
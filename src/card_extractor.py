@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 
 from src.card import Card
+from src.metrics import metrics
 
 
 class CardExtractor:
@@ -11,23 +12,32 @@ class CardExtractor:
     2) contour detection and quadrilateral selection
     3) perspective correction to produce normalized card images
 
+    When detect_max_dim is set and the image is larger, steps 1) and 2) run on a downscaled
+    copy (with kernel sizes scaled accordingly), then the corners are refined with sub-pixel
+    accuracy on the full resolution image before the perspective correction.
+
+    get_cards() can take hint boxes (e.g. the cards of the previous frame): steps 1) and 2)
+    then only run on each hint region plus a margin, and the full image is scanned only if
+    a hinted card is not found anymore.
+
     When debug=True, intermediate steps are displayed with cv2.imshow().
     """
 
     # Initialize the extractor with an BGR image.
-    def __init__(self, img: np.ndarray, debug: bool = False):
+    def __init__(self, img: np.ndarray, debug: bool = False, detect_max_dim: int = None):
         if img is None:
             raise ValueError('img must not be None')
         self.img = img
         self.debug = debug
+        self.detect_max_dim = detect_max_dim
 
     # Build a CardExtractor directly from an image file path.
     @classmethod
-    def from_file(cls, file_path: str, debug: bool = False):
+    def from_file(cls, file_path: str, debug: bool = False, detect_max_dim: int = None):
         img = cv2.imread(file_path)
         if img is None:
             raise ValueError(f'Could not read image from {file_path}')
-        return cls(img, debug=debug)
+        return cls(img, debug=debug, detect_max_dim=detect_max_dim)
 
     # Display an image in a window (for debugging).
     def _display(self, img, max_dim=1000):
@@ -45,37 +55,173 @@ class CardExtractor:
         cv2.destroyAllWindows()
 
     # Preprocess the image to create a binary mask for contour detection.
-    def _preprocess(self):
-        img_gray = cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY)
+    # scale < 1 means img is a downscaled copy: the kernels are shrunk to cover the same area.
+    def _preprocess(self, img=None, scale=1.0):
+        if img is None:
+            img = self.img
+        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         self._display(img_gray)
-        img_blur = cv2.GaussianBlur(img_gray, (7, 7), 0)
+
+        if scale < 1.0:
+            blur_size = self._odd(7 * scale)
+            block_size = self._odd(15 * scale)
+            kernel_size = max(2, round(7 * scale))
+            iterations = 1
+        else:
+            blur_size, block_size, kernel_size, iterations = 7, 15, 5, 2
+
+        img_blur = cv2.GaussianBlur(img_gray, (blur_size, blur_size), 0)
         self._display(img_blur)
         img_thresh = cv2.adaptiveThreshold(
             img_blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY_INV, 15, 2)
+            cv2.THRESH_BINARY_INV, block_size, 2)
         self._display(img_thresh)
-        kernel = np.ones((5, 5), np.uint8)
-        mask = cv2.morphologyEx(img_thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
+        kernel = np.ones((kernel_size, kernel_size), np.uint8)
+        mask = cv2.morphologyEx(img_thresh, cv2.MORPH_CLOSE, kernel, iterations=iterations)
         self._display(mask)
         return mask
 
+    # Round a kernel size to the nearest odd value (at least 3).
+    @staticmethod
+    def _odd(size):
+        size = max(3, round(size))
+        return size if size % 2 == 1 else size + 1
+
+    # Detect the card boxes in a region (x, y, w, h) of the image (whole image by default),
+    # on a downscaled copy when detect_max_dim is set. Boxes are returned in full image coordinates.
+    def _detect_boxes(self, region=None):
+        h, w = self.img.shape[:2]
+        x0, y0, rw, rh = region if region is not None else (0, 0, w, h)
+        img = self.img[y0:y0 + rh, x0:x0 + rw]
+
+        scale = 1.0
+        if self.detect_max_dim is not None and max(h, w) > self.detect_max_dim:
+            scale = self.detect_max_dim / max(h, w)
+            img = cv2.resize(img, (max(1, round(rw * scale)), max(1, round(rh * scale))), interpolation=cv2.INTER_LINEAR)
+
+        # Area thresholds stay relative to the whole image, even when only a region is searched.
+        cut_sides = None
+        if region is not None:
+            cut_sides = (x0 > 0, y0 > 0, x0 + rw < w, y0 + rh < h)
+        with metrics.timer('extractor.preprocess'):
+            mask = self._preprocess(img, scale)
+        with metrics.timer('extractor.extract_boxes'):
+            boxes = self._extract_boxes(mask, img_area=w * h * scale * scale, cut_sides=cut_sides)
+        if scale == 1.0:
+            return [b.reshape(4, 2).astype(np.float32) + np.float32([x0, y0]) for b in boxes]
+
+        # Map the corners back to full resolution, then refine them there.
+        boxes = [(b.reshape(4, 2).astype(np.float32) + 0.5) / scale - 0.5 + np.float32([x0, y0]) for b in boxes]
+        return [self._refine_corners(b, scale) for b in boxes]
+
+    # Search each hint box (plus a margin) for the card that best overlaps it.
+    # Returns None when a hinted card is not found, so that the caller falls back to a full scan.
+    def _detect_boxes_in_hints(self, hints, margin, min_iou=0.3):
+        h, w = self.img.shape[:2]
+        boxes = []
+        for hint in hints:
+            x, y, bw, bh = cv2.boundingRect(np.asarray(hint, dtype=np.float32).reshape(-1, 1, 2))
+            dx, dy = int(bw * margin), int(bh * margin)
+            x0, y0 = max(0, x - dx), max(0, y - dy)
+            x1, y1 = min(w, x + bw + dx), min(h, y + bh + dy)
+            if x1 - x0 < 2 or y1 - y0 < 2:
+                return None
+
+            candidates = self._detect_boxes((x0, y0, x1 - x0, y1 - y0))
+            ious = [Card.box_iou(b, hint) for b in candidates]
+            if not ious or max(ious) < min_iou:
+                return None
+            best = candidates[int(np.argmax(ious))]
+
+            # Overlapping hints may lead to the same card.
+            if all(Card.box_iou(best, b) < 0.5 for b in boxes):
+                boxes.append(best)
+        return boxes
+
+    # Refine the corners of a box with sub-pixel accuracy on the full resolution image.
+    # Card corners are rounded, so each side is refined instead: the strongest edge is searched along
+    # the side normal (within the uncertainty of the downscaled detection, about 1 / scale pixels),
+    # a line is fitted through the sub-pixel edge points, and the corners are the line intersections.
+    def _refine_corners(self, box, scale, num_samples=16):
+        radius = max(2, int(np.ceil(1.5 / scale)))
+        offsets = np.arange(-radius, radius + 1, dtype=np.float32)
+        t = np.linspace(0.15, 0.85, num_samples, dtype=np.float32)
+
+        lines = []
+        for i in range(4):
+            p0, p1 = box[i], box[(i + 1) % 4]
+            direction = p1 - p0
+            length = np.linalg.norm(direction)
+            if length < 1:
+                return box
+            normal = np.float32([-direction[1], direction[0]]) / length
+
+            # Intensity profiles across the side: (num_samples, 2 * radius + 1).
+            centers = p0 + t[:, None] * direction
+            map_x = (centers[:, 0:1] + offsets[None, :] * normal[0]).astype(np.float32)
+            map_y = (centers[:, 1:2] + offsets[None, :] * normal[1]).astype(np.float32)
+            profiles = cv2.remap(self.img, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+            profiles = profiles.astype(np.float32).mean(axis=2)
+
+            grad = np.abs(np.diff(profiles, axis=1))
+            k = np.clip(grad.argmax(axis=1), 1, grad.shape[1] - 2)
+            rows = np.arange(num_samples)
+            g0, g1, g2 = grad[rows, k - 1], grad[rows, k], grad[rows, k + 1]
+            denom = g0 - 2 * g1 + g2
+            sub = np.where(np.abs(denom) > 1e-6, 0.5 * (g0 - g2) / np.where(denom == 0, 1, denom), 0)
+            edge_pos = offsets[0] + k + 0.5 + np.clip(sub, -0.5, 0.5)
+
+            points = centers + edge_pos[:, None] * normal
+            vx, vy, x0, y0 = cv2.fitLine(points.astype(np.float32), cv2.DIST_HUBER, 0, 0.01, 0.01).ravel()
+            lines.append((np.float32([x0, y0]), np.float32([vx, vy])))
+
+        refined = box.copy()
+        for i in range(4):
+            (pa, da), (pb, db) = lines[i - 1], lines[i]
+            det = da[0] * -db[1] - da[1] * -db[0]
+            if abs(det) < 1e-6:
+                continue
+            diff = pb - pa
+            s_a = (diff[0] * -db[1] - diff[1] * -db[0]) / det
+            corner = pa + s_a * da
+            # Keep the coarse corner if the refinement went further than the search radius.
+            if np.linalg.norm(corner - box[i]) <= 2 * radius:
+                refined[i] = corner
+        return refined
+
     # Detect quadrilateral contour candidates that could correspond to cards.
-    def _extract_boxes(self, mask):
+    # img_area is the area the size thresholds are relative to (defaults to the mask area).
+    # cut_sides (left, top, right, bottom) flags the mask sides that cut through the image (region search):
+    # contours touching them are partial shapes and are rejected.
+    def _extract_boxes(self, mask, img_area=None, cut_sides=None, max_aspect=5.0):
         contours, hierarchy = cv2.findContours(
             mask.copy(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
 
-        debug_contours_all = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR).copy()
-        cv2.drawContours(debug_contours_all, contours, -1, (0, 255, 0), 1)
-        self._display(debug_contours_all)
+        if self.debug:
+            debug_contours_all = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR).copy()
+            cv2.drawContours(debug_contours_all, contours, -1, (0, 255, 0), 1)
+            self._display(debug_contours_all)
 
         h, w = mask.shape[:2]
-        img_area = w * h
+        if img_area is None:
+            img_area = w * h
 
         min_area = img_area * 0.01
         max_area = img_area * 0.80
 
         candidates = []
         for i, cnt in enumerate(contours):
+            # Cheap rejections on the bounding rect first: the contour area is at most the rect area,
+            # and a card seen from any angle is never a long thin shape.
+            x, y, bw, bh = cv2.boundingRect(cnt)
+            if bw * bh < min_area or max(bw, bh) > max_aspect * min(bw, bh):
+                continue
+
+            if cut_sides is not None:
+                touches = (x <= 1, y <= 1, x + bw >= w - 1, y + bh >= h - 1)
+                if any(t and c for t, c in zip(touches, cut_sides)):
+                    continue
+
             area = cv2.contourArea(cnt)
             if area > max_area or area < min_area:
                 continue
@@ -87,29 +233,42 @@ class CardExtractor:
                 if len(approx) == 4 and cv2.isContourConvex(approx):
                     candidates.append((i, approx))
                     break
-        
+
+        # Keep only the outermost candidates: drop those with a candidate among their ancestors.
+        # covered[p] caches "p or one of its ancestors is a candidate", so each contour is visited once.
+        parents = hierarchy[0][:, 3] if hierarchy is not None else []
+        is_candidate = np.zeros(len(contours), dtype=bool)
+        is_candidate[[i for i, _ in candidates]] = True
+        covered = np.full(len(contours), -1, dtype=np.int8)
+
         card_boxes = []
         for i, approx in candidates:
-            parent_idx = hierarchy[0][i][3]
-            keep = True
-
-            while parent_idx != -1:
-                if any(parent_idx == candidate[0] for candidate in candidates):
-                    keep = False
-                    break
-                parent_idx = hierarchy[0][parent_idx][3]
-            if keep:
+            path = []
+            p = parents[i]
+            while p != -1 and covered[p] == -1:
+                path.append(p)
+                p = parents[p]
+            result = p != -1 and covered[p] == 1
+            for q in reversed(path):
+                result = result or is_candidate[q]
+                covered[q] = result
+            if not result:
                 card_boxes.append(approx)
 
-        img_contours = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR).copy()
-        img_contours = cv2.drawContours(img_contours, card_boxes, -1, (255, 0, 0), 3)
-        self._display(img_contours)
+        if self.debug:
+            img_contours = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR).copy()
+            img_contours = cv2.drawContours(img_contours, card_boxes, -1, (255, 0, 0), 3)
+            self._display(img_contours)
         return card_boxes
 
     # Run the full pipeline and return the extracted cards (box + warped image).
-    def get_cards(self) -> list[Card]:
-        mask = self._preprocess()
-        boxes = self._extract_boxes(mask)
+    # With hints (boxes of previously detected cards), only the hinted regions are searched,
+    # unless a hinted card is missing; full_scan tells whether the whole image was scanned.
+    def get_cards(self, hints=None, margin: float = 0.15) -> list[Card]:
+        boxes = self._detect_boxes_in_hints(hints, margin) if hints else None
+        self.full_scan = boxes is None
+        if boxes is None:
+            boxes = self._detect_boxes()
 
         card_width = 300
         card_height = 600
@@ -117,16 +276,19 @@ class CardExtractor:
 
         cards = []
         for b in boxes:
-            b = b.reshape(4, 2).astype(np.float32)
-
             length_1 = cv2.norm(b[0] - b[1])
             length_2 = cv2.norm(b[1] - b[2])
 
             if length_1 < length_2:
                 b = np.concatenate([b[1:], [b[0]]])
+            # Keep the top edge of the warp (b[0]-b[3]) on the image top side, so that a card placed
+            # upside down stays upside down in its warped image.
+            if b[0][1] + b[3][1] > b[1][1] + b[2][1]:
+                b = np.concatenate([b[2:], b[:2]])
 
-            M = cv2.getPerspectiveTransform(b, card_pt)
-            card = cv2.warpPerspective(self.img, M, (card_width,card_height))
+            with metrics.timer('extractor.warp'):
+                M = cv2.getPerspectiveTransform(b, card_pt)
+                card = cv2.warpPerspective(self.img, M, (card_width,card_height))
             
             cards.append(Card(box=b, image=card))
         return cards
@@ -1,12 +1,19 @@
 import cv2
-import torch
+import json
+import hashlib
+import threading
 import numpy as np
-import torchvision.models as models
 
 from typing import Union
 from pathlib import Path
 from numpy.linalg import norm
-from torchvision import transforms
+from concurrent.futures import ThreadPoolExecutor
+
+from src.embedding_backend import create_backend
+from src.feature_cache import FeatureCache
+from src.metrics import metrics
+from src.sift_index import InvertedSiftIndex
+from src.utils import project_root
 
 
 """
@@ -27,124 +34,429 @@ class CardRecognizer:
     Recognizes a card image by comparing it to a reference dataset (ref_dir).
 
     Workflow:
-    - Precompute one embedding + one SIFT descriptor set per reference image.
+    - Precompute two embeddings (upright and rotated by 180°) + one SIFT descriptor set per reference image
+      (kept in an on-disk FeatureCache, only recomputed for added or changed images).
     - For an input card image:
-        (A) compute embedding similarity against all references (fast)
+        (A) compute embedding similarity against all references in both orientations (fast, one forward pass);
+            the best orientation tells whether the card is reversed
         (B) keep top-N candidates
         (C) rerank using SIFT match score (more discriminative)
+
+    With mode='inverted_index', (B) and (C) are replaced by a single query of an
+    InvertedSiftIndex holding the SIFT descriptors of all references: every reference is
+    scored at once and the best score of each label is kept. The embedding is then only
+    used for the min_score filter.
+
+    matcher='flann' is approximate: the KD-trees only visit flann_checks leaves, so a ratio-test score
+    can differ from the brute force one. With the defaults (1 tree, 32 checks) the difference is about
+    1 point on average on the 0-100 scale, up to about 10 points for a single reference; 512 checks keep
+    it under 1 point but are slower than brute force (see scripts/benchmark_sift_matcher.py). The trees
+    are built with a fixed seed, so the scores are reproducible.
+
+    With features='orb' or 'akaze', SIFT is replaced by compact binary descriptors matched with
+    the Hamming distance (the method names keep the word "sift").
     """
 
     # Initialize the recognizer: load the embedding model, SIFT matcher, and precompute reference features.
-    def __init__(self, ref_dir: Union[str, Path]):
+    # matcher selects the SIFT matching backend: 'bf' (brute force) or 'flann' (one prebuilt KD-tree index per reference).
+    # mode selects the reranking: 'shortlist' (embedding top-N + SIFT) or 'inverted_index' (global SIFT index).
+    # backend selects the embedding runtime: 'torch', 'torchscript' or 'onnx' (quantize=True for int8, onnx only).
+    # backbone selects the embedding model: 'resnet18', 'mobilenet_v3_small' or 'hog_color', fed with input_size (width, height) images.
+    # sift_workers > 1 extracts and matches the SIFT features of the cards of a batch concurrently (OpenCV releases the GIL);
+    # embedding_threads is the intra-op thread budget of the embedding runtime (None keeps the library default).
+    # features selects the local features used for reranking: 'sift' (float, L2) or the compact binary 'orb' / 'akaze' (Hamming).
+    # geometric_verification scores candidates by RANSAC homography inliers instead of ratio-test matches; being more
+    # discriminative, it allows fewer nfeatures / num_candidates and an early stop once a candidate has at least
+    # early_stop_inliers inliers and twice as many as any other candidate scored so far.
+    # early_exit_margin: when the embedding top-1 beats the best other label by at least this cosine margin, SIFT is skipped
+    # (calibrate it with scripts/calibrate_early_exit.py; None always reranks).
+    def __init__(self, ref_dir: Union[str, Path], cache_dir: Union[str, Path, None] = None, use_cache: bool = True,
+                 matcher: str = 'bf', flann_trees: int = 1, flann_checks: int = 32,
+                 mode: str = 'shortlist', num_words: int = 500,
+                 backend: str = 'torch', quantize: bool = False, model_dir: Union[str, Path, None] = None,
+                 backbone: str = 'resnet18', input_size: tuple[int, int] = (224, 224),
+                 sift_workers: int = 1, embedding_threads: int = None, early_exit_margin: float = None,
+                 features: str = 'sift', geometric_verification: bool = False, nfeatures: int = 5000,
+                 num_candidates: int = 6, early_stop_inliers: int = None):
+        if matcher not in ('bf', 'flann'):
+            raise ValueError(f"matcher must be 'bf' or 'flann', got '{matcher}'")
+        if features not in ('sift', 'orb', 'akaze'):
+            raise ValueError(f"features must be 'sift', 'orb' or 'akaze', got '{features}'")
+        if mode not in ('shortlist', 'inverted_index'):
+            raise ValueError(f"mode must be 'shortlist' or 'inverted_index', got '{mode}'")
         self.ref_dir: Path = Path(ref_dir)
+        self.mode = mode
+        self.num_words = num_words
+        self.matcher = matcher
+        self.flann_trees = flann_trees
+        self.flann_checks = flann_checks
+        self.features = features
+        self.binary_features = features != 'sift'
 
-        self.model = models.resnet18(weights=models.ResNet18_Weights.DEFAULT)
-        self.model = torch.nn.Sequential(*(list(self.model.children())[:-1]))
-        self.model.eval()
+        self.input_size = tuple(input_size)
+        self.backend = create_backend(backend, model_dir, input_size=self.input_size, quantize=quantize, backbone=backbone,
+                                      num_threads=embedding_threads)
 
-        self.preprocess = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Resize((224, 224)),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ])
+        self.mean = [0.485, 0.456, 0.406]
+        self.std = [0.229, 0.224, 0.225]
+        # (x / 255 - mean) / std == (x - 255 * mean) * (1 / (255 * std)), per RGB channel.
+        self.pixel_mean = (np.float32(self.mean) * 255).reshape(3, 1, 1)
+        self.pixel_scale = (1 / (np.float32(self.std) * 255)).reshape(3, 1, 1)
+        self.normalize_input = self.backend.normalized
+        self.batch_buffers = threading.local()
 
-        self.sift = cv2.SIFT_create(nfeatures=5000)
-        self.bf = cv2.BFMatcher()
+        self.nfeatures = nfeatures
+        self.num_candidates = num_candidates
+        self.geometric_verification = geometric_verification
+        self.early_stop_inliers = early_stop_inliers
         self.img_size = (300, 600)
+        self.thread_local = threading.local()
+        self.sift_workers = sift_workers
+        self.early_exit_margin = early_exit_margin
+        self.executor = ThreadPoolExecutor(sift_workers, thread_name_prefix='sift') if sift_workers > 1 else None
+
+        if cache_dir is None:
+            cache_dir = project_root() / 'data' / 'cache' / self.ref_dir.name
+        self.cache = FeatureCache(cache_dir, {
+            'embedding': self.backend.cache_key,
+            'input_size': self.input_size,
+            'resize': 'area',
+            'orientations': 2,
+            'mean': self.mean,
+            'std': self.std,
+            'features': self.features,
+            'nfeatures': self.nfeatures,
+            'img_size': self.img_size,
+        }) if use_cache else None
 
-        self.ref_embeddings = self._load_embeddings()
-        self.ref_sift = self._load_sift_descriptors()
+        self.ref_labels, ref_embeddings, self.ref_sift = self._load_references()
+        # Rows 0..N-1: upright references, rows N..2N-1: the same references rotated by 180°.
+        self.ref_matrix = np.ascontiguousarray(ref_embeddings.transpose(1, 0, 2).reshape(-1, ref_embeddings.shape[2]))
+        self.ref_embeddings = self.ref_matrix[:len(self.ref_labels)]
+        self.label_rows = {label: np.flatnonzero(self.ref_labels == label) for label in np.unique(self.ref_labels)}
+        self.ref_matchers = self._build_flann_matchers() if matcher == 'flann' else None
+        self.sift_index = self._build_sift_index() if mode == 'inverted_index' and len(self.ref_labels) > 0 else None
 
-    # Precompute embeddings for all reference images in ref_dir.
-    def _load_embeddings(self):
-        image_paths = sorted(
+    # List the reference images of ref_dir.
+    def _reference_paths(self):
+        return sorted(
             list(self.ref_dir.glob('*.jpg')) +
             list(self.ref_dir.glob('*.png'))
         )
 
-        embeddings = {}
-        for img_path in image_paths:
-            img = cv2.imread(str(img_path))
-            emb = self._img_to_embedding(img)
-            embeddings[img_path.stem] = emb
-        return embeddings
+    # Load embeddings + SIFT features of all reference images, reusing the cache for unchanged files.
+    # Returns the label array, the (N, 2, D) upright/reversed embeddings and the SIFT features, all in the same row order.
+    def _load_references(self):
+        cached = self.cache.load() if self.cache is not None else {}
+
+        entries = []
+        changed = False
+        for img_path in self._reference_paths():
+            label = img_path.stem
+            file_hash = FeatureCache.file_hash(img_path) if self.cache is not None else None
+
+            if label in cached and cached[label][0] == file_hash:
+                _, emb, kp, desc = cached[label]
+            else:
+                img = cv2.imread(str(img_path))
+                emb = self._reference_embeddings(img)
+                kp, desc = self._img_to_sift(img)
+                kp = self._keypoints_to_array(kp)
+                if desc is None:
+                    desc = np.zeros((0, self._sift()[0].descriptorSize()), np.uint8 if self.binary_features else np.float32)
+                changed = True
+            entries.append((label, file_hash, emb, kp, desc))
+
+        if self.cache is not None and (changed or len(entries) != len(cached)):
+            # Copy memory-mapped entries before the cache files are replaced.
+            entries = [(l, h, np.array(e), np.array(k), np.array(d)) for l, h, e, k, d in entries]
+            try:
+                self.cache.save(entries)
+            except OSError:
+                pass
+
+        self.ref_hashes = [file_hash for _, file_hash, _, _, _ in entries]
+        labels = np.array([label for label, _, _, _, _ in entries], dtype=str)
+        if entries:
+            embeddings = np.ascontiguousarray([emb for _, _, emb, _, _ in entries], dtype=np.float32).reshape(len(entries), 2, -1)
+        else:
+            # Empty or missing ref_dir: no reference, every image is unrecognized. The embedding size comes from the model.
+            dim = self._reference_embeddings(np.zeros((*self.img_size[::-1], 3), np.uint8)).shape[-1]
+            embeddings = np.zeros((0, 2, dim), np.float32)
+        norms = norm(embeddings, axis=2, keepdims=True)
+        embeddings /= np.where(norms > 0, norms, 1)
+        descriptors = [(kp, desc) for _, _, _, kp, desc in entries]
+        return labels, embeddings, descriptors
+
+    # Build and train one FLANN matcher per reference so the index is reused by every query
+    # (KD-tree for SIFT, multi-probe LSH for binary descriptors). The randomized trees are seeded for reproducible scores.
+    def _build_flann_matchers(self):
+        cv2.setRNGSeed(0)
+        FLANN_INDEX_KDTREE = 1
+        FLANN_INDEX_LSH = 6
+        if self.binary_features:
+            index_params = dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1)
+        else:
+            index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=self.flann_trees)
+
+        matchers = []
+        for _, desc in self.ref_sift:
+            flann = cv2.FlannBasedMatcher(index_params, dict(checks=self.flann_checks))
+            if len(desc) > 0:
+                flann.add([np.ascontiguousarray(desc, dtype=np.uint8 if self.binary_features else np.float32)])
+                flann.train()
+            matchers.append(flann)
+        return matchers
+
+    # Build the global inverted SIFT index; the vocabulary and the reference words are cached with the features.
+    def _build_sift_index(self):
+        self.label_names, self.ref_label_ids = np.unique(self.ref_labels, return_inverse=True)
+        descriptors = [desc for _, desc in self.ref_sift]
+
+        # The words depend on the reference images and on the local feature settings (features, nfeatures, img_size).
+        config = self.cache.config if self.cache is not None else None
+        key = hashlib.sha1(json.dumps([self.ref_hashes, self.num_words, config]).encode('utf-8')).hexdigest()
+        vocabulary = ref_words = None
+        if self.cache is not None:
+            vocabulary = self.cache.load_array('vocabulary', key)
+            ref_words = self.cache.load_array('ref_words', key)
+        if vocabulary is None or ref_words is None or len(ref_words) != sum(len(desc) for desc in descriptors):
+            vocabulary = ref_words = None
+
+        index = InvertedSiftIndex(descriptors, num_words=self.num_words, vocabulary=vocabulary, ref_words=ref_words)
+
+        if self.cache is not None and vocabulary is None:
+            try:
+                self.cache.save_array('vocabulary', index.vocabulary, key)
+                self.cache.save_array('ref_words', index.ref_words, key)
+            except OSError:
+                pass
+        return index
 
     # Compute the normalized embedding for a given image.
     def _img_to_embedding(self, img):
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        input_tensor = self.preprocess(img_rgb)
-        input_batch = input_tensor.unsqueeze(0)
-
-        with torch.no_grad():
-            embedding = self.model(input_batch)
-        
-        emb = embedding.squeeze().numpy()
-        n = norm(emb)
-        if n > 0:
-            emb = emb / n
-        return emb
-
-    # Precompute SIFT descriptors for all reference images in ref_dir.
-    def _load_sift_descriptors(self):
-        image_paths = sorted(
-            list(self.ref_dir.glob('*.jpg')) +
-            list(self.ref_dir.glob('*.png'))
-        )
+        return self._imgs_to_embeddings([img])[0]
 
-        descriptors = {}
-        for img_path in image_paths:
-            img = cv2.imread(str(img_path))
-            kp, desc = self._img_to_sift(img)
-            descriptors[img_path.stem] = (kp, desc)
-        return descriptors
-    
-    # Compute SIFT keypoints and descriptors for a given image.
+    # Compute the (2, D) normalized embeddings of a reference image, upright and rotated by 180°.
+    def _reference_embeddings(self, img):
+        return self._imgs_to_embeddings([img], flip=True)
+
+    # Return a batch array of the given shape, reusing the (per-thread) buffer of the previous batch when possible.
+    def _batch_buffer(self, shape, dtype):
+        buffer = getattr(self.batch_buffers, dtype.__name__, None)
+        if buffer is None or buffer.shape[0] < shape[0] or buffer.shape[1:] != shape[1:]:
+            buffer = np.empty((max(shape[0], 8), *shape[1:]), dtype)
+            setattr(self.batch_buffers, dtype.__name__, buffer)
+        return buffer[:shape[0]]
+
+    # Build the backend input batch: normalized RGB (N, 3, H, W) floats for the CNN backbones, resized BGR images otherwise.
+    # Each card is resized once in uint8 then written into the batch buffer; with flip=True the 180° rotations of the
+    # resized cards are appended (rows n..2n-1).
+    # The returned batch is only valid until the next call from the same thread.
+    def _preprocess_batch(self, imgs, flip: bool = False):
+        n = len(imgs)
+        w, h = self.input_size
+        size = 2 * n if flip else n
+
+        if not self.normalize_input:
+            batch = self._batch_buffer((size, h, w, 3), np.uint8)
+            for i, img in enumerate(imgs):
+                batch[i] = cv2.resize(img, self.input_size, interpolation=cv2.INTER_AREA)
+                if flip:
+                    batch[n + i] = batch[i, ::-1, ::-1]
+            return batch
+
+        batch = self._batch_buffer((size, 3, h, w), np.float32)
+        for i, img in enumerate(imgs):
+            small = cv2.resize(img, self.input_size, interpolation=cv2.INTER_AREA)
+            # BGR (H, W, 3) -> RGB (3, H, W) view, normalized directly into the batch row.
+            np.subtract(small.transpose(2, 0, 1)[::-1], self.pixel_mean, out=batch[i])
+            batch[i] *= self.pixel_scale
+            if flip:
+                batch[n + i] = batch[i, :, ::-1, ::-1]
+        return batch
+
+    # Compute the normalized embeddings of several images with a single forward pass.
+    # With flip=True, the embeddings of the 180° rotated images follow (rows n..2n-1).
+    def _imgs_to_embeddings(self, imgs, flip: bool = False):
+        with metrics.timer('recognizer.embedding'):
+            emb = self.backend(self._preprocess_batch(imgs, flip=flip))
+        n = norm(emb, axis=1, keepdims=True)
+        return emb / np.where(n > 0, n, 1)
+
+    # Return the local feature detector (SIFT, ORB or AKAZE) and brute-force matcher (L2 or Hamming) of the calling thread
+    # (OpenCV objects are not shared between threads).
+    def _sift(self):
+        if not hasattr(self.thread_local, 'sift'):
+            if self.features == 'orb':
+                self.thread_local.sift = cv2.ORB_create(nfeatures=self.nfeatures)
+            elif self.features == 'akaze':
+                self.thread_local.sift = cv2.AKAZE_create()
+            else:
+                self.thread_local.sift = cv2.SIFT_create(nfeatures=self.nfeatures)
+            self.thread_local.bf = cv2.BFMatcher(cv2.NORM_HAMMING if self.binary_features else cv2.NORM_L2)
+        return self.thread_local.sift, self.thread_local.bf
+
+    # Compute the local feature keypoints and descriptors (SIFT by default) for a given image.
     def _img_to_sift(self, img):
-        img = cv2.resize(img, self.img_size)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        keypoints, descriptors = self.sift.detectAndCompute(gray,None)
+        with metrics.timer('recognizer.sift_extract'):
+            img = cv2.resize(img, self.img_size)
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            keypoints, descriptors = self._sift()[0].detectAndCompute(gray,None)
         return keypoints, descriptors
 
-    # Compute the SIFT match score between two sets of keypoints/descriptors.
-    def _sift_score(self, kp, desc, ref_kp, ref_desc, ratio=0.75):
-        if desc is None or ref_desc is None:
-            return 0
-        matches = self.bf.knnMatch(desc, ref_desc, k=2)
-
-        good = []
-        for m,n in matches:
-            if m.distance < ratio * n.distance:
-                good.append([m])
-        return len(good) * 100 / len(kp) if len(kp) > 0 else 0
+    # Convert cv2.KeyPoint objects to a compact (N, 6) array: x, y, size, angle, response, octave.
+    @staticmethod
+    def _keypoints_to_array(keypoints):
+        return np.array(
+            [(*k.pt, k.size, k.angle, k.response, k.octave) for k in keypoints],
+            dtype=np.float32).reshape(-1, 6)
+
+    # Count the matches between the query keypoints/descriptors and a reference (by row index): ratio-test matches,
+    # or with geometric_verification the inliers of the RANSAC homography fitted on them.
+    def _match_count(self, kp, desc, ref_idx, ratio=0.75):
+        with metrics.timer('recognizer.sift_match'):
+            ref_kp, ref_desc = self.ref_sift[ref_idx]
+            if desc is None or len(ref_desc) == 0:
+                return 0
+            if self.ref_matchers is not None:
+                matches = self.ref_matchers[ref_idx].knnMatch(desc, k=2)
+            else:
+                matches = self._sift()[1].knnMatch(desc, ref_desc, k=2)
+
+            good = []
+            for pair in matches:
+                if len(pair) == 2 and pair[0].distance < ratio * pair[1].distance:
+                    good.append(pair[0])
+            if not self.geometric_verification:
+                return len(good)
+            if len(good) < 4:
+                return 0
+
+            src = np.float32([kp[m.queryIdx].pt for m in good])
+            dst = np.ascontiguousarray(ref_kp[[m.trainIdx for m in good], :2])
+            _, mask = cv2.findHomography(src, dst, cv2.RANSAC, 5.0)
+            return int(mask.sum()) if mask is not None else 0
+
+    # Compute the SIFT match score (matches or inliers per 100 query keypoints) between the query and a reference.
+    def _sift_score(self, kp, desc, ref_idx, ratio=0.75):
+        return self._match_count(kp, desc, ref_idx, ratio) * 100 / len(kp) if len(kp) > 0 else 0
     
-    # Recognize the input image and return top_k matches with their scores.
-    def recognize(self, img, top_k: int = 1, min_score: float = None):
-        img_flip = cv2.rotate(img, cv2.ROTATE_180)
-        emb1 = self._img_to_embedding(img)
-        emb2 = self._img_to_embedding(img_flip)
-        
-        embed_scores = []
-
-        for label, embed_ref in self.ref_embeddings.items():
-            score1 = float(np.dot(emb1, embed_ref))
-            score2 = float(np.dot(emb2, embed_ref))
-            embed_scores.append((label, max(score1, score2)))
-        embed_scores.sort(key=lambda x: x[1], reverse=True)
+    # Recognize the input image and return top_k matches with their scores (see recognize_batch).
+    def recognize(self, img, top_k: int = 1, min_score: float = None, with_orientation: bool = False, with_source: bool = False):
+        return self.recognize_batch([img], top_k=top_k, min_score=min_score, with_orientation=with_orientation,
+                                    with_source=with_source)[0]
 
-        if min_score is not None:
-            embed_scores = [s for s in embed_scores if s[1] >= min_score]
-        
-        if not embed_scores:
+    # Score query embeddings against the references in both orientations with one matmul.
+    # Returns the (N, n) best-orientation scores and the (N, n) mask of queries matching the reversed reference better.
+    def _embedding_scores(self, queries):
+        scores = self.ref_matrix @ np.asarray(queries, dtype=np.float32).T
+        upright, reversed_ = scores[:len(self.ref_labels)], scores[len(self.ref_labels):]
+        return np.maximum(upright, reversed_), reversed_ > upright
+
+    # Recognize several images (e.g. all cards of a frame) with a single forward pass of the model.
+    # Returns one list of top_k (label, score) matches per image, or (label, score, reversed) with with_orientation=True;
+    # with_source=True appends the scoring source, which sets the scale of the scores of that image:
+    # - 'sift': matches (or RANSAC inliers) per 100 query keypoints, in [0, 100];
+    # - 'inverted_index': tf-idf cosine of the SIFT visual words x 100, in [0, 100];
+    # - 'embedding': embedding cosine similarity, in [-1, 1] (early exit, SIFT skipped).
+    # Scores are only comparable between matches of the same source.
+    def recognize_batch(self, images, top_k: int = 1, min_score: float = None, with_orientation: bool = False,
+                        with_source: bool = False):
+        if len(images) == 0:
             return []
-        
-        N = min(max(top_k * 3, 6), len(embed_scores))
-        candidates = embed_scores[:N]
+
+        n = len(images)
+        embed_scores, reversed_ = self._embedding_scores(self._imgs_to_embeddings(images))
+
+        if self.executor is not None and n > 1:
+            results = list(self.executor.map(
+                lambda i: self._rerank(images[i], embed_scores[:, i], top_k, min_score), range(n)))
+        else:
+            results = [self._rerank(img, embed_scores[:, i], top_k, min_score) for i, img in enumerate(images)]
+
+        return [
+            [(label, score)
+             + ((self._is_reversed(label, embed_scores[:, i], reversed_[:, i]),) if with_orientation else ())
+             + ((source,) if with_source else ()) for label, score in r]
+            for i, (source, r) in enumerate(results)
+        ]
+
+    # Orientation of a card recognized as label: the one of its best matching reference of that label.
+    def _is_reversed(self, label, embed_scores, reversed_):
+        rows = self.label_rows[label]
+        return bool(reversed_[rows[np.argmax(embed_scores[rows])]])
+
+    # Shortlist references by embedding score, then rerank them with SIFT.
+    # Returns (scoring source, matches), the source being 'embedding', 'inverted_index' or 'sift'.
+    def _rerank(self, img, embed_scores, top_k, min_score):
+        valid = np.arange(len(embed_scores))
+        if min_score is not None:
+            valid = np.flatnonzero(embed_scores >= min_score)
+
+        if len(valid) == 0:
+            return ('inverted_index' if self.sift_index is not None else 'sift'), []
+
+        if self.early_exit_margin is not None:
+            results = self._early_exit(embed_scores, valid, top_k)
+            if results is not None:
+                metrics.increment('recognizer.early_exit')
+                return 'embedding', results
+
+        if self.sift_index is not None:
+            return 'inverted_index', self._rerank_inverted_index(img, valid, top_k)
+
+        N = min(max(top_k * 3, self.num_candidates), len(valid))
+        candidates = valid[np.argpartition(-embed_scores[valid], N - 1)[:N]]
+        candidates = candidates[np.argsort(-embed_scores[candidates], kind='stable')]
         kp_image, desc_image = self._img_to_sift(img)
 
+        # Candidates are scored in embedding order, so the early stop keeps the most likely ones.
+        counts = []
         hybrid_scores = []
-        for label, _ in candidates:
-            kp_ref, desc_ref = self.ref_sift[label]
-            hybrid_scores.append((label, self._sift_score(kp_image, desc_image, kp_ref, desc_ref)))
+        for idx in candidates:
+            count = self._match_count(kp_image, desc_image, idx)
+            counts.append(count)
+            hybrid_scores.append((str(self.ref_labels[idx]), count * 100 / len(kp_image) if len(kp_image) > 0 else 0))
+            if self.early_stop_inliers is not None and len(counts) >= max(top_k, 2):
+                best, second = sorted(counts, reverse=True)[:2]
+                if best >= self.early_stop_inliers and best >= 2 * second:
+                    break
         hybrid_scores.sort(key=lambda x: x[1], reverse=True)
 
-        return hybrid_scores[:top_k]
+        return 'sift', hybrid_scores[:top_k]
+
+    # Margin between the embedding score of the best valid reference and the best reference of another label.
+    def _embedding_margin(self, embed_scores, valid):
+        order = valid[np.argsort(-embed_scores[valid], kind='stable')]
+        others = np.flatnonzero(self.ref_labels[order] != self.ref_labels[order[0]])
+        second = embed_scores[order[others[0]]] if len(others) > 0 else -1.0
+        return float(embed_scores[order[0]] - second), order
+
+    # Cascade: if the embedding margin is decisive, return the top_k labels ranked by embedding score (cosine
+    # similarity, not a SIFT score) without computing SIFT. Returns None for ambiguous cards.
+    def _early_exit(self, embed_scores, valid, top_k):
+        margin, order = self._embedding_margin(embed_scores, valid)
+        if margin < self.early_exit_margin:
+            return None
+
+        results = []
+        for idx in order:
+            label = str(self.ref_labels[idx])
+            if all(label != l for l, _ in results):
+                results.append((label, float(embed_scores[idx])))
+                if len(results) == top_k:
+                    break
+        return results
+
+    # Score all valid references with the inverted SIFT index and vote per label (best reference score).
+    def _rerank_inverted_index(self, img, valid, top_k):
+        _, desc_image = self._img_to_sift(img)
+        with metrics.timer('recognizer.sift_match'):
+            scores = self.sift_index.score(desc_image) * 100
+
+        label_scores = np.full(len(self.label_names), -np.inf, dtype=np.float32)
+        np.maximum.at(label_scores, self.ref_label_ids[valid], scores[valid])
+
+        best = np.argsort(-label_scores, kind='stable')[:top_k]
+        return [(str(self.label_names[i]), float(label_scores[i])) for i in best if np.isfinite(label_scores[i])]
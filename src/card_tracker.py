@@ -0,0 +1,111 @@
+from src.card import Card
+
+
+class CardTracker:
+    """
+    Associates the cards detected in consecutive frames so that recognition only runs when needed.
+
+    Each track remembers the box of its card at the time it was last recognized, with the
+    resulting label/confidence. For every new frame:
+    - each card is matched to the track with the highest box IoU (at least match_iou),
+    - a matched card that stayed in place (IoU with the recognized box >= stable_iou) and was
+      verified less than reverify_frames frames ago gets the track label (and orientation) back,
+    - new cards, moved cards and cards due for re-verification are sent to recognition.
+
+    Tracks that are not matched for more than max_missed frames are dropped.
+
+    update() runs both phases at once. Concurrent callers can instead call prepare() and apply()
+    under their own lock and recognize the pending cards in between, without holding it.
+    """
+
+    # Initialize the tracker with its association and re-recognition thresholds.
+    def __init__(self, match_iou: float = 0.3, stable_iou: float = 0.85, reverify_frames: int = 30, max_missed: int = 5):
+        self.match_iou = match_iou
+        self.stable_iou = stable_iou
+        self.reverify_frames = reverify_frames
+        self.max_missed = max_missed
+
+        self.tracks = []
+        self.frame_idx = 0
+
+    # Greedily match cards to tracks by decreasing IoU; returns one track (or None) per card.
+    def _associate(self, cards):
+        pairs = []
+        for i, card in enumerate(cards):
+            for j, track in enumerate(self.tracks):
+                iou = Card.box_iou(card.box, track['box'])
+                if iou >= self.match_iou:
+                    pairs.append((iou, i, j))
+        pairs.sort(reverse=True)
+
+        matches = [None] * len(cards)
+        used_tracks = set()
+        for _, i, j in pairs:
+            if matches[i] is None and j not in used_tracks:
+                matches[i] = self.tracks[j]
+                used_tracks.add(j)
+        return matches
+
+    # Reuse the labels of stable cards, call recognize(cards) on the others, then update the tracks.
+    def update(self, cards, recognize):
+        plan, pending = self.prepare(cards)
+        if pending:
+            recognize(pending)
+        return self.apply(cards, plan)
+
+    # First phase of update(): match the cards to the tracks and give the stable cards their track label.
+    # Returns the plan to pass to apply() and the cards that need recognition.
+    def prepare(self, cards):
+        frame_idx = self.frame_idx + 1
+        matches = self._associate(cards)
+
+        pending = []
+        for card, track in zip(cards, matches):
+            stable = (
+                track is not None and
+                frame_idx - track['verified_frame'] < self.reverify_frames and
+                Card.box_iou(card.box, track['recognized_box']) >= self.stable_iou
+            )
+            if stable:
+                card.label, card.confidence, card.reversed = track['label'], track['confidence'], track['reversed']
+            else:
+                pending.append(card)
+        return (frame_idx, matches, pending), pending
+
+    # Second phase of update(): update the tracks with the cards of a prepared frame, once its pending cards are recognized.
+    def apply(self, cards, plan):
+        frame_idx, matches, pending = plan
+        self.frame_idx = max(self.frame_idx, frame_idx)
+
+        pending_ids = {id(card) for card in pending}
+        tracks = []
+        for card, track in zip(cards, matches):
+            track = {} if track is None else track
+            if id(card) in pending_ids:
+                track.update({
+                    'recognized_box': card.box,
+                    'label': card.label,
+                    'confidence': card.confidence,
+                    'reversed': card.reversed,
+                    'verified_frame': frame_idx,
+                })
+            track['box'] = card.box
+            track['missed'] = 0
+            tracks.append(track)
+
+        matched = {id(track) for track in matches if track is not None}
+        for track in self.tracks:
+            if id(track) not in matched:
+                track['missed'] += 1
+                if track['missed'] <= self.max_missed:
+                    tracks.append(track)
+        self.tracks = tracks
+        return cards
+
+    # Boxes of the cards seen in the last frame (usable as CardExtractor hints).
+    def current_boxes(self):
+        return [track['box'] for track in self.tracks if track['missed'] == 0]
+
+    # Forget all tracks (e.g. when the scene changes completely).
+    def reset(self):
+        self.tracks = []
@@ -0,0 +1,234 @@
+import cv2
+import numpy as np
+
+from typing import Union
+from pathlib import Path
+
+from src.utils import project_root
+
+
+"""
+Embedding backends used by CardRecognizer.
+
+A backend turns a batch of card images resized to input_size (width, height) into (N, D) raw
+embeddings. The CNN backbones (classifier removed) take a float32 (N, 3, H, W) batch normalized
+with the ImageNet mean/std; the 'hog_color' backbone takes the uint8 BGR (N, H, W, 3) images
+(backend.normalized tells which one). Backbones:
+- 'resnet18' (512-d, default), 'mobilenet_v3_small' (576-d): pretrained torchvision models.
+- 'hog_color': HOG of the grayscale card + HSV color histogram, computed with OpenCV only.
+
+The CNN backbones run with one of these runtimes; torch is only imported by those that need it:
+- 'torch': eager-mode PyTorch model.
+- 'torchscript': the model traced once to data/models/<backbone>_<size>.pt, then loaded frozen
+  and optimized for inference.
+- 'onnx': the model exported once to data/models/<backbone>_<size>.onnx and run with ONNX Runtime.
+  With quantize=True, an int8 dynamically quantized copy (<backbone>_<size>.int8.onnx) is used.
+  Once the files exist, torch is not needed anymore. Requires the onnx extra (uv sync --extra onnx).
+"""
+BACKBONES = {
+    'resnet18': 'ResNet18_Weights.IMAGENET1K_V1',
+    'mobilenet_v3_small': 'MobileNet_V3_Small_Weights.IMAGENET1K_V1',
+    'hog_color': None,
+}
+
+
+# Build the pretrained backbone without its classification layers.
+def build_torch_model(backbone: str = 'resnet18'):
+    import torch
+    import torchvision.models as models
+
+    model = models.get_model(backbone, weights=BACKBONES[backbone])
+    if backbone.startswith('resnet'):
+        layers = list(model.children())[:-1]
+    else:
+        layers = [model.features, model.avgpool]
+    model = torch.nn.Sequential(*layers)
+    model.eval()
+    return model
+
+
+class TorchBackend:
+    """
+    Eager-mode PyTorch backend.
+    """
+
+    name = 'torch'
+    normalized = True
+
+    # Load the model in eager mode. num_threads (if set) is the torch intra-op thread budget.
+    def __init__(self, backbone: str = 'resnet18', input_size=(224, 224), num_threads: int = None):
+        import torch
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.backbone = backbone
+        self.input_size = tuple(input_size)
+        self.model = build_torch_model(backbone)
+
+    # Key identifying the embeddings this backend produces (used by the reference feature cache).
+    @property
+    def cache_key(self):
+        return f'{self.name}:{BACKBONES[self.backbone]}:{self.input_size[0]}x{self.input_size[1]}'
+
+    # Compute the raw embeddings of a preprocessed batch.
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        with self.torch.no_grad():
+            embedding = self.model(self.torch.from_numpy(np.ascontiguousarray(batch, dtype=np.float32)))
+        return embedding.reshape(len(batch), -1).numpy()
+
+
+class TorchScriptBackend(TorchBackend):
+    """
+    TorchScript backend: the traced model is saved once, then loaded frozen for inference.
+    """
+
+    name = 'torchscript'
+
+    # Load the TorchScript model, tracing and saving it first if needed.
+    def __init__(self, model_dir: Path, backbone: str = 'resnet18', input_size=(224, 224), num_threads: int = None):
+        import torch
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.backbone = backbone
+        self.input_size = tuple(input_size)
+        model_path = Path(model_dir) / f'{backbone}_{self.input_size[0]}x{self.input_size[1]}.pt'
+
+        if not model_path.is_file():
+            model_path.parent.mkdir(parents=True, exist_ok=True)
+            example = torch.zeros((1, 3, self.input_size[1], self.input_size[0]), dtype=torch.float32)
+            with torch.no_grad():
+                traced = torch.jit.trace(build_torch_model(backbone), example)
+            traced.save(str(model_path))
+
+        self.model = torch.jit.optimize_for_inference(torch.jit.load(str(model_path)).eval())
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime backend, with optional int8 dynamic quantization.
+    """
+
+    name = 'onnx'
+    normalized = True
+
+    # Create the ONNX Runtime session, exporting (and quantizing) the model first if needed.
+    def __init__(self, model_dir: Path, backbone: str = 'resnet18', input_size=(224, 224), quantize: bool = False,
+                 num_threads: int = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The 'onnx' embedding backend requires onnx and onnxruntime (uv sync --extra onnx)") from e
+
+        self.backbone = backbone
+        self.input_size = tuple(input_size)
+        self.quantize = quantize
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / f'{backbone}_{self.input_size[0]}x{self.input_size[1]}.onnx'
+        if not model_path.is_file():
+            self._export(model_path)
+
+        if quantize:
+            quantized_path = model_path.with_suffix('.int8.onnx')
+            if not quantized_path.is_file():
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                quantize_dynamic(str(model_path), str(quantized_path), weight_type=QuantType.QUInt8)
+            model_path = quantized_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or 0
+        self.session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    # Export the truncated model to ONNX with a dynamic batch dimension.
+    def _export(self, model_path: Path):
+        import torch
+
+        model_path.parent.mkdir(parents=True, exist_ok=True)
+        example = torch.zeros((1, 3, self.input_size[1], self.input_size[0]), dtype=torch.float32)
+        torch.onnx.export(
+            build_torch_model(self.backbone), example, str(model_path),
+            input_names=['input'], output_names=['embedding'],
+            dynamic_axes={'input': {0: 'batch'}, 'embedding': {0: 'batch'}},
+            dynamo=False,
+        )
+
+    # Key identifying the embeddings this backend produces (used by the reference feature cache).
+    @property
+    def cache_key(self):
+        return f'{self.name}{"-int8" if self.quantize else ""}:{BACKBONES[self.backbone]}:{self.input_size[0]}x{self.input_size[1]}'
+
+    # Compute the raw embeddings of a preprocessed batch.
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        output = self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+        return output.reshape(len(batch), -1)
+
+
+class HogColorBackend:
+    """
+    Hand-crafted descriptor: HOG of the grayscale card concatenated with an HSV color histogram.
+
+    The HOG grid always has 8x8 cells whatever the input size (blocks of 2x2 cells, stride of
+    one cell), so the descriptor has 7*7*36 + 8*4*4 = 1892 values. Both parts are L2-normalized
+    (the histogram after a square root) so that they weigh the same in the cosine similarity.
+    """
+
+    name = 'opencv'
+    backbone = 'hog_color'
+    normalized = False
+
+    # Create the HOG descriptor for the given input size.
+    def __init__(self, input_size=(128, 128), hist_bins=(8, 4, 4)):
+        self.input_size = tuple(input_size)
+        self.hist_bins = list(hist_bins)
+        cell = (self.input_size[0] // 8, self.input_size[1] // 8)
+        self.win_size = (cell[0] * 8, cell[1] * 8)
+        self.hog = cv2.HOGDescriptor(self.win_size, (cell[0] * 2, cell[1] * 2), cell, cell, 9)
+
+    # Key identifying the embeddings this backend produces (used by the reference feature cache).
+    @property
+    def cache_key(self):
+        return f'{self.name}:hog_color{self.hist_bins}:{self.input_size[0]}x{self.input_size[1]}'
+
+    # Compute the descriptors of a uint8 BGR (N, H, W, 3) batch.
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        embeddings = []
+        for img in batch:
+            gray = cv2.cvtColor(img[:self.win_size[1], :self.win_size[0]], cv2.COLOR_BGR2GRAY)
+            hog = self.hog.compute(gray).ravel()
+            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+            hist = np.sqrt(cv2.calcHist([hsv], [0, 1, 2], None, self.hist_bins, [0, 180, 0, 256, 0, 256]).ravel())
+            embeddings.append(np.concatenate([
+                hog / max(np.linalg.norm(hog), 1e-6),
+                hist / max(np.linalg.norm(hist), 1e-6),
+            ]))
+        return np.array(embeddings, dtype=np.float32).reshape(len(batch), -1)
+
+
+# Create the embedding backend for a backbone ('resnet18', 'mobilenet_v3_small' or 'hog_color')
+# and a runtime ('torch', 'torchscript' or 'onnx'; the 'hog_color' backbone only runs with OpenCV).
+# num_threads is the intra-op thread budget of the runtime (None keeps the library default).
+def create_backend(name: str = 'torch', model_dir: Union[str, Path, None] = None, input_size=(224, 224),
+                   quantize: bool = False, backbone: str = 'resnet18', num_threads: int = None):
+    if model_dir is None:
+        model_dir = project_root() / 'data' / 'models'
+
+    if backbone not in BACKBONES:
+        raise ValueError(f"backbone must be one of {list(BACKBONES)}, got '{backbone}'")
+    if quantize and name != 'onnx':
+        raise ValueError("quantize is only supported by the 'onnx' backend")
+    if backbone == 'hog_color':
+        if name != 'torch':
+            raise ValueError("the 'hog_color' backbone does not use a model runtime, keep backend='torch'")
+        return HogColorBackend(input_size)
+    if name == 'torch':
+        return TorchBackend(backbone, input_size, num_threads=num_threads)
+    if name == 'torchscript':
+        return TorchScriptBackend(model_dir, backbone, input_size, num_threads=num_threads)
+    if name == 'onnx':
+        return OnnxBackend(model_dir, backbone, input_size, quantize=quantize, num_threads=num_threads)
+    raise ValueError(f"backend must be 'torch', 'torchscript' or 'onnx', got '{name}'")
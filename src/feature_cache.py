@@ -0,0 +1,113 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+from typing import Union
+from pathlib import Path
+
+
+class FeatureCache:
+    """
+    Versioned on-disk cache of the reference card features used by CardRecognizer.
+
+    Layout of cache_dir:
+    - manifest.json: cache version, feature config and one entry per reference image
+      (label, file hash, number of keypoints, offset in the keypoint arrays)
+    - embeddings.npy: (N, ...) float32 array of normalized embeddings, one entry per reference
+      (CardRecognizer stores (2, D) per reference: upright and rotated by 180°)
+    - descriptors.npy: (K, D') local feature descriptors of all references, concatenated
+    - keypoints.npy: (K, 6) float32 keypoints (x, y, size, angle, response, octave)
+    - <name>.npy + <name>.key: optional derived arrays (e.g. a visual vocabulary) tagged with the key
+      they were computed for, see load_array() / save_array()
+
+    The arrays are memory-mapped on load. The cache is only valid if the version and the
+    config (model weights, preprocessing parameters, ...) match; each entry is then reused
+    only if the hash of its image file did not change.
+    """
+
+    VERSION = 1
+
+    # Initialize the cache for a directory and the config the features were computed with.
+    def __init__(self, cache_dir: Union[str, Path], config: dict):
+        self.cache_dir = Path(cache_dir)
+        self.config = json.loads(json.dumps(config))
+        self.manifest_path = self.cache_dir / 'manifest.json'
+
+    # Compute the hash of a file content.
+    @staticmethod
+    def file_hash(file_path: Path):
+        return hashlib.sha1(Path(file_path).read_bytes()).hexdigest()
+
+    # Load the cached entries as {label: (hash, embedding, keypoints, descriptors)}, or {} if invalid.
+    def load(self):
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+            if manifest.get('version') != self.VERSION or manifest.get('config') != self.config:
+                return {}
+
+            embeddings = np.load(self.cache_dir / 'embeddings.npy', mmap_mode='r')
+            descriptors = np.load(self.cache_dir / 'descriptors.npy', mmap_mode='r')
+            keypoints = np.load(self.cache_dir / 'keypoints.npy', mmap_mode='r')
+        except Exception:
+            return {}
+
+        entries = {}
+        for row, entry in enumerate(manifest['entries']):
+            start = entry['offset']
+            end = start + entry['count']
+            entries[entry['label']] = (
+                entry['hash'],
+                embeddings[row],
+                keypoints[start:end],
+                descriptors[start:end],
+            )
+        return entries
+
+    # Write all entries, given as a list of (label, hash, embedding, keypoints, descriptors).
+    def save(self, entries):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # The manifest is written last: an interrupted save leaves no manifest, hence an invalid cache.
+        self.manifest_path.unlink(missing_ok=True)
+
+        manifest_entries = []
+        offset = 0
+        for label, file_hash, _, kp, _ in entries:
+            manifest_entries.append({'label': label, 'hash': file_hash, 'offset': offset, 'count': len(kp)})
+            offset += len(kp)
+
+        embeddings = np.ascontiguousarray([e[2] for e in entries], dtype=np.float32)
+        keypoints = np.concatenate([e[3] for e in entries]).astype(np.float32) if entries else np.zeros((0, 6), np.float32)
+        descriptors = np.concatenate([e[4] for e in entries]) if entries else np.zeros((0, 0), np.float32)
+
+        arrays = {'embeddings.npy': embeddings, 'descriptors.npy': descriptors, 'keypoints.npy': keypoints}
+        for name, array in arrays.items():
+            tmp_path = self.cache_dir / (name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, self.cache_dir / name)
+
+        manifest = {'version': self.VERSION, 'config': self.config, 'entries': manifest_entries}
+        tmp_path = self.cache_dir / 'manifest.json.tmp'
+        tmp_path.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.manifest_path)
+
+    # Load a derived array saved with save_array(), or None if missing or computed for another key.
+    def load_array(self, name: str, key: str):
+        try:
+            if (self.cache_dir / f'{name}.key').read_text(encoding='utf-8') != key:
+                return None
+            return np.load(self.cache_dir / f'{name}.npy', mmap_mode='r')
+        except Exception:
+            return None
+
+    # Save a derived array together with the key (hash of its inputs) it was computed for.
+    def save_array(self, name: str, array: np.ndarray, key: str):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        (self.cache_dir / f'{name}.key').unlink(missing_ok=True)
+
+        tmp_path = self.cache_dir / f'{name}.npy.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, self.cache_dir / f'{name}.npy')
+        (self.cache_dir / f'{name}.key').write_text(key, encoding='utf-8')
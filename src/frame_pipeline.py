@@ -0,0 +1,170 @@
+import threading
+
+from collections import deque
+
+
+class LatestQueue:
+    """
+    Small bounded queue where the newest item wins.
+
+    Putting an item into a full queue drops the oldest one instead of blocking, so a slow
+    consumer always gets the most recent items. Drops are counted for monitoring.
+    """
+
+    # Initialize an empty queue holding at most maxsize items.
+    def __init__(self, maxsize: int = 1):
+        self.items = deque()
+        self.maxsize = maxsize
+        self.cond = threading.Condition()
+        self.closed = False
+        self.puts = 0
+        self.drops = 0
+
+    # Add an item, dropping the oldest one if the queue is full.
+    def put(self, item):
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.drops += 1
+            self.items.append(item)
+            self.puts += 1
+            self.cond.notify()
+
+    # Return the oldest item, or None if the timeout expires or the queue is closed.
+    def get(self, timeout: float = None):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout=timeout):
+                return None
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    # Wake up every waiting consumer; get() returns None once the queue is empty.
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    # Current number of queued items.
+    def depth(self):
+        with self.cond:
+            return len(self.items)
+
+
+class FramePipeline:
+    """
+    Staged camera pipeline: capture -> recognition workers -> display.
+
+    - A capture thread reads frames continuously and pushes them, numbered, into two
+      latest-frame-wins queues: one for recognition (a copy) and one for display, so that
+      drawing on the displayed frame never alters a frame being recognized. Capture never
+      waits for recognition, so frames do not pile up in the camera driver buffer.
+    - A pool of recognition workers runs process(frame, seq) on the newest frames and publishes
+      the result if it is more recent than the one already published.
+    - The display loop (caller thread) takes the newest frame with get_display_frame() and
+      overlays latest_results().
+
+    stats() reports the per-stage queue depth, drop and processed counters.
+    """
+
+    # Initialize the pipeline with a read() function (like cv2.VideoCapture.read) and a process(frame, seq) function
+    # (seq is the capture number of the frame: workers may finish frames out of order).
+    def __init__(self, read, process, num_workers: int = 1, queue_size: int = 1):
+        self.read = read
+        self.process = process
+        self.num_workers = num_workers
+
+        self.recognition_queue = LatestQueue(queue_size)
+        self.display_queue = LatestQueue(queue_size)
+
+        self.running = False
+        self.threads = []
+        self.results_lock = threading.Lock()
+        self.results = None
+        self.results_seq = -1
+        self.captured = 0
+        self.processed = 0
+        self.stale = 0
+        self.errors = 0
+
+    # Start the capture thread and the recognition workers.
+    def start(self):
+        self.running = True
+        self.threads = [threading.Thread(target=self._capture_loop, daemon=True)]
+        self.threads += [threading.Thread(target=self._recognition_loop, daemon=True) for _ in range(self.num_workers)]
+        for t in self.threads:
+            t.start()
+
+    # Stop every stage and wait for the threads to finish.
+    def stop(self):
+        self.running = False
+        self.recognition_queue.close()
+        self.display_queue.close()
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join()
+
+    # Capture stage: read frames as fast as the camera delivers them.
+    def _capture_loop(self):
+        seq = 0
+        while self.running:
+            ret, frame = self.read()
+            if not ret:
+                print("Can't receive frame. Exiting ...")
+                self.running = False
+                break
+            self.captured += 1
+            # Recognition gets its own copy: the display stage draws on its frame in place.
+            self.recognition_queue.put((seq, frame.copy()))
+            self.display_queue.put((seq, frame))
+            seq += 1
+        self.recognition_queue.close()
+        self.display_queue.close()
+
+    # Recognition stage: process the newest frames and publish the most recent result.
+    def _recognition_loop(self):
+        while True:
+            item = self.recognition_queue.get()
+            if item is None:
+                break
+            seq, frame = item
+            try:
+                result = self.process(frame, seq)
+            except Exception as e:
+                print(f'Frame {seq} failed: {e}')
+                self.errors += 1
+                continue
+
+            with self.results_lock:
+                self.processed += 1
+                if seq > self.results_seq:
+                    self.results_seq = seq
+                    self.results = result
+                else:
+                    self.stale += 1
+
+    # Display stage: return the newest captured (seq, frame), or None after timeout / when stopped.
+    def get_display_frame(self, timeout: float = 0.1):
+        return self.display_queue.get(timeout=timeout)
+
+    # Return (seq, result) of the most recent processed frame.
+    def latest_results(self):
+        with self.results_lock:
+            return self.results_seq, self.results
+
+    # Per-stage counters: queue depth, drops (frames replaced by newer ones before use) and throughput.
+    def stats(self):
+        return {
+            'capture': {'frames': self.captured},
+            'recognition': {
+                'depth': self.recognition_queue.depth(),
+                'drops': self.recognition_queue.drops,
+                'processed': self.processed,
+                'stale': self.stale,
+                'errors': self.errors,
+            },
+            'display': {
+                'depth': self.display_queue.depth(),
+                'drops': self.display_queue.drops,
+            },
+        }
@@ -6,9 +6,11 @@ from src.utils import load_settings, project_root
 if __name__ == '__main__':
     data_dir = project_root() / 'data'
     ref_dir = data_dir / 'cards'
-    tarot_app = TarotApp(ref_dir, 1, 3, 1, model_name_stt='vosk-model-small-fr-0.22')
-    
     settings = load_settings()
+    tarot_app = TarotApp(ref_dir, 1, 3, 1, model_name_stt='vosk-model-small-fr-0.22', num_workers=settings['recognition_workers'], detect_max_dim=settings['detect_max_dim'],
+                         sift_workers=settings['sift_workers'], embedding_threads=settings['embedding_threads'], opencv_threads=settings['opencv_threads'],
+                         early_exit_margin=settings['early_exit_margin'], metrics_enabled=settings['metrics'], metrics_dump_period=settings['metrics_dump_period'])
+    
     if 'camera_index' in settings:
         tarot_app.run(settings['camera_index'])
     else:
@@ -0,0 +1,177 @@
+import os
+import cv2
+import json
+import time
+import threading
+import numpy as np
+
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from collections import deque, defaultdict
+
+
+class Metrics:
+    """
+    Lightweight in-process instrumentation of the hot paths (disabled by default).
+
+    - timer(name) is a context manager recording the duration (ms) of a stage; observe(name, ms)
+      records a duration measured elsewhere. increment(name) counts events.
+    - The last `window` durations of each stage are kept, and summary() reports their count,
+      mean and p50/p90/p99 (rolling percentiles).
+    - draw_overlay(frame) writes the p50/p90 of each stage on a video frame.
+    - to_json() / to_prometheus() export the summary; start_dump() rewrites both files every
+      `period` seconds (e.g. for the Prometheus node_exporter textfile collector).
+
+    When disabled, timer() returns a shared no-op context manager and nothing is recorded.
+    Stage names are dotted, e.g. 'extractor.preprocess', 'recognizer.embedding', 'tts.speak'.
+    """
+
+    # Create an empty registry; window is the number of durations kept per stage.
+    def __init__(self, enabled: bool = False, window: int = 500):
+        self.enabled = enabled
+        self.window = window
+        self.lock = threading.Lock()
+        self.durations = defaultdict(lambda: deque(maxlen=self.window))
+        self.totals = defaultdict(int)
+        self.sums = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.dump_thread = None
+        self.dump_stop = threading.Event()
+        self.noop = nullcontext()
+
+    # Enable or disable recording.
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    # Forget every recorded value.
+    def reset(self):
+        with self.lock:
+            self.durations.clear()
+            self.totals.clear()
+            self.sums.clear()
+            self.counters.clear()
+
+    # Context manager timing the enclosed block under the given stage name.
+    def timer(self, name: str):
+        if not self.enabled:
+            return self.noop
+        return self._timed(name)
+
+    # Generator behind timer(): records the elapsed time of the block in milliseconds.
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    # Record a duration in milliseconds.
+    def observe(self, name: str, ms: float):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.durations[name].append(ms)
+            self.totals[name] += 1
+            self.sums[name] += ms
+
+    # Add value to an event counter.
+    def increment(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += value
+
+    # Per-stage statistics: {name: {count, sum, mean, p50, p90, p99, max}} (ms), plus the counters.
+    # count and sum cover every recorded duration, the other statistics the rolling window.
+    def summary(self):
+        with self.lock:
+            windows = {name: np.array(values) for name, values in self.durations.items() if values}
+            totals = dict(self.totals)
+            sums = dict(self.sums)
+            counters = dict(self.counters)
+
+        stages = {}
+        for name, values in sorted(windows.items()):
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            stages[name] = {
+                'count': totals[name],
+                'sum': round(sums[name], 3),
+                'mean': round(float(values.mean()), 3),
+                'p50': round(float(p50), 3),
+                'p90': round(float(p90), 3),
+                'p99': round(float(p99), 3),
+                'max': round(float(values.max()), 3),
+            }
+        return {'timestamp': time.time(), 'stages': stages, 'counters': dict(sorted(counters.items()))}
+
+    # JSON export of the summary.
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    # Prometheus text exposition of the summary (stage durations as summaries in ms, counters as totals).
+    def to_prometheus(self, prefix: str = 'tarot'):
+        summary = self.summary()
+        lines = [
+            f'# HELP {prefix}_stage_duration_ms Stage duration in milliseconds (rolling window quantiles).',
+            f'# TYPE {prefix}_stage_duration_ms summary',
+        ]
+        for name, stats in summary['stages'].items():
+            for quantile, key in [('0.5', 'p50'), ('0.9', 'p90'), ('0.99', 'p99')]:
+                lines.append(f'{prefix}_stage_duration_ms{{stage="{name}",quantile="{quantile}"}} {stats[key]}')
+            lines.append(f'{prefix}_stage_duration_ms_sum{{stage="{name}"}} {stats["sum"]}')
+            lines.append(f'{prefix}_stage_duration_ms_count{{stage="{name}"}} {stats["count"]}')
+        lines += [
+            f'# HELP {prefix}_events_total Event counters.',
+            f'# TYPE {prefix}_events_total counter',
+        ]
+        for name, value in summary['counters'].items():
+            lines.append(f'{prefix}_events_total{{name="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    # Write the JSON and Prometheus exports to <dump_dir>/metrics.json and <dump_dir>/metrics.prom (atomic replace).
+    def dump(self, dump_dir):
+        dump_dir = Path(dump_dir)
+        dump_dir.mkdir(parents=True, exist_ok=True)
+        for filename, text in [('metrics.json', self.to_json()), ('metrics.prom', self.to_prometheus())]:
+            tmp_path = dump_dir / (filename + '.tmp')
+            tmp_path.write_text(text, encoding='utf-8')
+            os.replace(tmp_path, dump_dir / filename)
+
+    # Dump the metrics every period seconds from a background thread (and once more on stop_dump()).
+    def start_dump(self, dump_dir, period: float = 10.0):
+        self.stop_dump()
+        self.dump_stop.clear()
+
+        def loop():
+            while not self.dump_stop.wait(period):
+                self.dump(dump_dir)
+            self.dump(dump_dir)
+
+        self.dump_thread = threading.Thread(target=loop, daemon=True)
+        self.dump_thread.start()
+
+    # Stop the periodic dump thread.
+    def stop_dump(self):
+        if self.dump_thread is not None:
+            self.dump_stop.set()
+            self.dump_thread.join()
+            self.dump_thread = None
+
+    # Draw the p50/p90 of the given stages (all by default) in the top-left corner of the frame.
+    def draw_overlay(self, img, names=None, color=(0, 255, 255)):
+        if not self.enabled:
+            return img
+        stages = self.summary()['stages']
+        y = 20
+        for name in names or stages:
+            if name in stages:
+                text = f"{name}: p50 {stages[name]['p50']:.1f} / p90 {stages[name]['p90']:.1f} ms"
+                cv2.putText(img, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1)
+                y += 18
+        return img
+
+
+
+# Shared registry used by the app components (enable it with metrics.enable()).
+metrics = Metrics()
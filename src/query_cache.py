@@ -0,0 +1,65 @@
+import re
+import time
+import threading
+import unicodedata
+
+from collections import OrderedDict
+
+
+# Normalize a question for cache lookups: Unicode NFKC, case folding, punctuation removed, whitespace collapsed
+# ("Combien de cartes ?" and "combien  de cartes" give the same key).
+def normalize_question(question: str) -> str:
+    question = unicodedata.normalize('NFKC', question).casefold()
+    question = re.sub(r"[^\w\s'’-]", ' ', question)
+    return ' '.join(question.split())
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache with a time to live, used by TarotRag for query embeddings and retrieval results.
+
+    At most max_size entries are kept (the least recently used one is evicted first), and an entry
+    older than ttl seconds is treated as missing. clear() drops everything, e.g. when the index changes.
+    """
+
+    # Create an empty cache; clock returns the current time in seconds (monotonic by default).
+    def __init__(self, max_size: int = 128, ttl: float = 3600.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Return the cached value of a key, or None if it is missing or expired.
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or self.clock() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    # Store a value, evicting the least recently used entries beyond max_size.
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (self.clock(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    # Drop every entry.
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    # Number of entries (expired ones included until they are looked up).
+    def __len__(self):
+        return len(self.entries)
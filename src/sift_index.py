@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+
+
+class InvertedSiftIndex:
+    """
+    Bag-of-visual-words inverted index over the local descriptors of all reference cards.
+
+    How it works:
+    - A vocabulary of visual words is learned with k-means on a sample of the reference descriptors.
+    - Every reference descriptor is quantized to its nearest word (FLANN KD-tree over the words).
+    - For each word, a posting list stores the references containing it with a tf-idf weight.
+    - A query is quantized once, and every reference is scored in a single pass over the
+      posting lists of the query words (cosine similarity of tf-idf vectors, in [0, 1]).
+
+    Reference:
+    Sivic & Zisserman, "Video Google: A Text Retrieval Approach to Object Matching in Videos" (ICCV 2003)
+    """
+
+    # Build the index from one descriptor array per reference; vocabulary/words may come from a cache.
+    def __init__(self, ref_descriptors, num_words: int = 500, sample_size: int = 20000, seed: int = 0,
+                 vocabulary: np.ndarray = None, ref_words: np.ndarray = None):
+        self.num_refs = len(ref_descriptors)
+        descriptors = [self._as_float(d) for d in ref_descriptors]
+        all_desc = np.concatenate(descriptors) if descriptors else np.zeros((0, 128), np.float32)
+
+        if vocabulary is None:
+            vocabulary = self._build_vocabulary(all_desc, num_words, sample_size, seed)
+        self.vocabulary = np.ascontiguousarray(vocabulary, dtype=np.float32)
+        self.num_words = len(self.vocabulary)
+
+        FLANN_INDEX_KDTREE = 1
+        self.quantizer = cv2.FlannBasedMatcher(dict(algorithm=FLANN_INDEX_KDTREE, trees=4), dict(checks=32))
+        self.quantizer.add([self.vocabulary])
+        self.quantizer.train()
+
+        if ref_words is None:
+            ref_words = self._quantize(all_desc)
+        self.ref_words = np.asarray(ref_words, dtype=np.int32)
+
+        ref_ids = np.repeat(np.arange(self.num_refs), [len(d) for d in descriptors])
+        self._build_postings(ref_ids, self.ref_words)
+
+    # Binary descriptors are unpacked to bits so that the L2 distance matches the Hamming distance.
+    @staticmethod
+    def _as_float(desc):
+        desc = np.asarray(desc)
+        if desc.dtype == np.uint8:
+            return np.unpackbits(desc, axis=1).astype(np.float32)
+        return desc.astype(np.float32, copy=False)
+
+    # Learn the visual words with k-means on a random sample of the reference descriptors.
+    @staticmethod
+    def _build_vocabulary(all_desc, num_words, sample_size, seed):
+        rng = np.random.default_rng(seed)
+        if len(all_desc) > sample_size:
+            all_desc = all_desc[rng.choice(len(all_desc), sample_size, replace=False)]
+        num_words = min(num_words, len(all_desc))
+
+        cv2.setRNGSeed(seed)
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1e-3)
+        _, _, centers = cv2.kmeans(np.ascontiguousarray(all_desc), num_words, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+        return centers
+
+    # Return the nearest visual word of every descriptor.
+    def _quantize(self, desc):
+        if len(desc) == 0:
+            return np.zeros(0, np.int32)
+        matches = self.quantizer.match(np.ascontiguousarray(desc, dtype=np.float32))
+        return np.array([m.trainIdx for m in matches], dtype=np.int32)
+
+    # Build the tf-idf weighted posting lists (CSR layout: one slice of refs/weights per word).
+    def _build_postings(self, ref_ids, words):
+        counts = np.zeros((self.num_refs, self.num_words), np.float32)
+        np.add.at(counts, (ref_ids, words), 1)
+
+        doc_freq = np.count_nonzero(counts, axis=0)
+        self.idf = np.log((self.num_refs + 1) / (doc_freq + 1)).astype(np.float32)
+
+        weights = counts * self.idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        weights /= np.where(norms > 0, norms, 1)
+
+        word_idx, ref_idx = np.nonzero(weights.T)
+        self.post_refs = ref_idx.astype(np.int32)
+        self.post_weights = weights[ref_idx, word_idx]
+        self.post_offsets = np.zeros(self.num_words + 1, np.int64)
+        np.cumsum(np.bincount(word_idx, minlength=self.num_words), out=self.post_offsets[1:])
+
+    # Score every reference against the query descriptors in a single pass.
+    def score(self, desc):
+        scores = np.zeros(self.num_refs, np.float32)
+        if desc is None or len(desc) == 0:
+            return scores
+
+        words = self._quantize(self._as_float(desc))
+        query = np.bincount(words, minlength=self.num_words).astype(np.float32) * self.idf
+        n = np.linalg.norm(query)
+        if n == 0:
+            return scores
+        query /= n
+
+        query_words = np.flatnonzero(query)
+        starts = self.post_offsets[query_words]
+        lengths = self.post_offsets[query_words + 1] - starts
+        if lengths.sum() == 0:
+            return scores
+
+        # Gather the posting lists of all query words at once.
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        contributions = self.post_weights[positions] * np.repeat(query[query_words], lengths)
+        return np.bincount(self.post_refs[positions], weights=contributions, minlength=self.num_refs).astype(np.float32)
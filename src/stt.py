@@ -4,6 +4,7 @@ import pyaudio
 import keyboard
 import threading
 
+from src.metrics import metrics
 from src.utils import project_root
 
 
@@ -82,7 +83,8 @@ class STT:
     def get_text(self):
         self.event.clear()
 
-        with self.lock:
+        # Latency between the key release and the final transcript.
+        with metrics.timer('stt.final'), self.lock:
             final_result = json.loads(self.rec.FinalResult())
         final_result = final_result['text']
         if final_result:
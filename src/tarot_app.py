@@ -4,17 +4,21 @@ import keyboard
 import threading
 
 from src.card_recognizer import CardRecognizer
+from src.card_tracker import CardTracker
+from src.frame_pipeline import FramePipeline
+from src.metrics import metrics
 from src.tarot_questions import TarotQuestions
 from src.card_extractor import CardExtractor
 from src.tarot_reader import TarotReader
 from src.stt import STT
 from src.tts import TTS
+from src.utils import project_root
 
 
 class TarotApp:
     """
     Main application loop that ties together:
-    - Camera capture
+    - Camera capture, recognition and display as separate pipeline stages (FramePipeline)
     - Card extraction (CardExtractor)
     - Tarot reading generation (TarotReader) with text-to-speech (TTS)
     - Push-to-talk questions (STT) answered by TarotQuestions (RAG)
@@ -28,12 +32,24 @@ class TarotApp:
     """
 
     # Initialize the app components and main timing/state parameters
-    def __init__(self, ref_dir, stable_seconds = 1.0, num_cards = 3, time_under_three_cards = 1.0, model_name_tts='fr_FR-tom-medium.onnx', model_name_stt='vosk-model-fr-0.22'):
+    def __init__(self, ref_dir, stable_seconds = 1.0, num_cards = 3, time_under_three_cards = 1.0, model_name_tts='fr_FR-tom-medium.onnx', model_name_stt='vosk-model-fr-0.22', reverify_frames = 30, num_workers = 1, detect_max_dim = None, full_scan_period = 10, sift_workers = 1, embedding_threads = None, opencv_threads = None, early_exit_margin = None, metrics_enabled = False, metrics_dump_period = 10.0):
         self.STABLE_SECONDS = stable_seconds
         self.NUM_CARDS = num_cards
         self.TIME_UNDER_THREE_CARDS = time_under_three_cards
-
-        self.card_recognizer = CardRecognizer(ref_dir)
+        self.NUM_WORKERS = num_workers
+        self.DETECT_MAX_DIM = detect_max_dim
+        self.FULL_SCAN_PERIOD = full_scan_period
+        self.METRICS_DUMP_PERIOD = metrics_dump_period
+
+        # Per-stage timings (see src/metrics.py): overlay on the frames and periodic dump to data/metrics/.
+        metrics.enable(metrics_enabled)
+
+        # Thread budgets: OpenCV's internal pool, the embedding runtime and the per-card SIFT workers share the cores.
+        if opencv_threads is not None:
+            cv2.setNumThreads(opencv_threads)
+        self.card_recognizer = CardRecognizer(ref_dir, sift_workers=sift_workers, embedding_threads=embedding_threads,
+                                              early_exit_margin=early_exit_margin)
+        self.card_tracker = CardTracker(reverify_frames=reverify_frames)
         self.tarot_reader = TarotReader()
         self.tts = TTS(model_name=model_name_tts)
         self.stt = STT(model_name=model_name_stt)
@@ -44,22 +60,64 @@ class TarotApp:
         self.last_labels_detected = []
         self.reading_done = False
         self.under_three_since = None
+        self.frames_since_full_scan = 0
+        self.last_applied_seq = -1
 
         self.audio_lock = threading.Lock()
-
-    # Process a single video frame: extract cards, recognize them, and handle reading logic.
+        # Recognition workers share the tracker/recognizer and the reading state.
+        self.tracker_lock = threading.Lock()
+        self.state_lock = threading.Lock()
+
+    # Recognize the given cards in one batch and store the best label/confidence/orientation on each card.
+    def _recognize_cards(self, cards):
+        all_results = self.card_recognizer.recognize_batch([card.image for card in cards], min_score=0.75, with_orientation=True)
+        for card, results in zip(cards, all_results):
+            if results:
+                card.label, card.confidence, card.reversed = results[0]
+
+    # Process a single video frame: extract cards, recognize them, handle reading logic and draw the results.
     def _process_frame(self, frame):
-        cards = CardExtractor(frame).get_cards()
-        current_labels = []
-
-        for card in cards:
-            results = self.card_recognizer.recognize(card.image, min_score=0.75)
-            if not results:
-                continue
-            card.label, card.confidence = results[0]
-            current_labels.append(card.label)
+        for card in self._analyze_frame(frame):
             card.draw_on(frame)
+        return frame
 
+    # Extract and recognize the cards of a frame, update the reading logic and return the recognized cards.
+    # The extraction only searches around the previous cards, with a full scan every FULL_SCAN_PERIOD frames
+    # (or when a card goes missing) to find new cards. Cards that did not move keep their label (see CardTracker).
+    # seq is the capture number of the frame (FramePipeline): recognition runs outside the tracker lock, so workers
+    # can finish out of order, and a frame older than the last applied one does not update the tracker or the reading.
+    def _analyze_frame(self, frame, seq=None):
+        with metrics.timer('frame.analyze'):
+            metrics.increment('frames')
+            with self.tracker_lock:
+                hints = None
+                if self.frames_since_full_scan < self.FULL_SCAN_PERIOD:
+                    hints = self.card_tracker.current_boxes()
+
+            extractor = CardExtractor(frame, detect_max_dim=self.DETECT_MAX_DIM)
+            cards = extractor.get_cards(hints)
+
+            with self.tracker_lock:
+                plan, pending = self.card_tracker.prepare(cards)
+            if pending:
+                self._recognize_cards(pending)
+
+            with self.tracker_lock:
+                fresh = seq is None or seq > self.last_applied_seq
+                if fresh:
+                    self.last_applied_seq = self.last_applied_seq if seq is None else seq
+                    self.frames_since_full_scan = 0 if extractor.full_scan else self.frames_since_full_scan + 1
+                    self.card_tracker.apply(cards, plan)
+            cards = [card for card in cards if card.label is not None]
+
+            if fresh:
+                with self.state_lock:
+                    self._update_reading([card.label for card in cards], [bool(card.reversed) for card in cards])
+            return cards
+
+    # Start the reading once the expected number of cards is stable, and reset it once they are removed.
+    # current_reversed gives the orientation of each card (reversed cards are read as such).
+    def _update_reading(self, current_labels, current_reversed=None):
         if len(current_labels) == self.NUM_CARDS and self.speaking_finish and not self.reading_done:
             current_sorted = sorted(current_labels)
             last_sorted = sorted(self.last_labels_detected)
@@ -68,17 +126,16 @@ class TarotApp:
                 self.last_labels_detected = current_sorted.copy()
                 self.last_time = time.time()
 
-            def worker(labels):
+            def worker(labels, reversed_cards, start):
                 with self.audio_lock:
-                    for sentence in self.tarot_reader.stream_predict(labels):
-                        self.tts.speak(sentence)
+                    self._speak_stream(self.tarot_reader.stream_predict(labels, reversed_cards), 'reading.time_to_first_audio', start)
                     self.speaking_finish = True
                     self.reading_done = True
 
             if time.time() - self.last_time > self.STABLE_SECONDS:
                 print('start prediction')
                 self.speaking_finish = False
-                threading.Thread(target=worker, args=(current_labels,)).start()
+                threading.Thread(target=worker, args=(current_labels, current_reversed, time.perf_counter())).start()
 
             self.under_three_since = None
         else:
@@ -90,10 +147,21 @@ class TarotApp:
                         self.reading_done = False
                         self.last_labels_detected = []
                         self.under_three_since = None
-        return frame
     
+    # Speak a stream of sentences as they arrive. The time from start (time.perf_counter()) to the first
+    # audio is recorded under metric_name and printed.
+    def _speak_stream(self, sentences, metric_name, start):
+        def report_first_audio():
+            latency = (time.perf_counter() - start) * 1000
+            metrics.observe(metric_name, latency)
+            print(f'\n{metric_name}: {latency:.0f} ms')
+
+        for i, sentence in enumerate(sentences):
+            self.tts.speak(sentence, on_audio_start=report_first_audio if i == 0 else None)
+
     # Handle push-to-talk question on key release.
     def _on_release(self):
+        released = time.perf_counter()
         question = self.stt.get_text()
         print(question)
         if not self.speaking_finish:
@@ -102,12 +170,12 @@ class TarotApp:
         if not question.strip():
             return
 
+        # The answer is spoken sentence by sentence while it is generated.
         def worker(q):
             with self.audio_lock:
                 self.speaking_finish = False
                 try:
-                    answer = self.tarot_questions.answer(q)
-                    self.tts.speak(answer)
+                    self._speak_stream(self.tarot_questions.stream_answer(q), 'qa.time_to_first_audio', released)
                 finally:
                     self.speaking_finish = True
 
@@ -134,18 +202,29 @@ class TarotApp:
 
         self.tts.speak('Bonjour. Tirez trois cartes de tarot et placez-les devant la caméra.')
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Can't receive frame. Exiting ...")
-                break
+        pipeline = FramePipeline(cap.read, self._analyze_frame, num_workers=self.NUM_WORKERS)
+        pipeline.start()
+        if metrics.enabled:
+            metrics.start_dump(project_root() / 'data' / 'metrics', period=self.METRICS_DUMP_PERIOD)
+
+        while pipeline.running:
+            item = pipeline.get_display_frame()
+            if item is None:
+                continue
+            _, frame = item
 
-            frame = self._process_frame(frame)
+            _, cards = pipeline.latest_results()
+            for card in cards or []:
+                card.draw_on(frame)
+            metrics.draw_overlay(frame)
 
             cv2.imshow('frame', frame)
             if cv2.waitKey(1) == ord('q'):
                 break
 
+        pipeline.stop()
+        metrics.stop_dump()
+        print(pipeline.stats())
         cap.release()
         cv2.destroyAllWindows()
         self.stt.close()
@@ -1,9 +1,13 @@
+import time
+import hashlib
 import textwrap
 
 from ollama import chat
 
+from src.answer_cache import AnswerCache
 from src.tarot_rag import TarotRag
-from src.utils import load_prompt, project_root, Default
+from src.metrics import metrics
+from src.utils import load_prompt, project_root, stream_sentences, Default
 
 
 class TarotQuestions:
@@ -13,17 +17,21 @@ class TarotQuestions:
     This class:
     - Retrieves relevant snippets from the local tarot knowledge base (Chroma via TarotRag).
     - Builds a user prompt that includes the retrieved context + the user's question.
-    - Queries a local Ollama model with strict instructions.
+    - Queries a local Ollama model with strict instructions, either for the whole answer (answer())
+      or sentence by sentence as it is generated (stream_answer(), so that TTS can start early).
+    - Reuses the answers of already asked questions (and of their paraphrases) for the same retrieved
+      snippets, model and prompts (AnswerCache in data/cache/answers.sqlite, answer_cache=False disables it).
     
     Note: The structure and wording of the prompts were refined with the help of
     ChatGPT (OpenAI) to get clearer and more consistent readings.
     """
 
     # Initialize the Q&A pipeline: retrieval settings, model name, and prompt templates.
-    def __init__(self, model_name: str = 'llama3.2:3b', n_results = 4):
+    def __init__(self, model_name: str = 'llama3.2:3b', n_results = 4, answer_cache = True):
         self.model_name = model_name
         self.n_results = n_results
         self.tarot_rag = TarotRag()
+        self.answer_cache = AnswerCache() if answer_cache else None
 
         self.user_prompt_path = project_root() / 'data' / 'prompts' / 'questions_user.txt'
         system_prompt_path = project_root() / 'data' / 'prompts' / 'questions_system.txt'
@@ -49,14 +57,25 @@ class TarotQuestions:
         """))
 
     # Build the user prompt with retrieved context and the user's question.
-    def _build_prompt(self, question):
-        retrieved_docs = self.tarot_rag.query_chroma(question, self.n_results)['documents']
+    # results are the retrieval results of the question (queried if not given).
+    def _build_prompt(self, question, results = None):
+        if results is None:
+            results = self.tarot_rag.query_chroma(question, self.n_results)
+        retrieved_docs = results['documents']
         if retrieved_docs:
             context = '\n\n---\n\n'.join(retrieved_docs[0]) 
         else:
             context = "Aucun contexte pertinent n'a pu être trouvé dans la base de connaissances sur le tarot."
 
-        prompt = load_prompt(self.user_prompt_path, textwrap.dedent("""
+        prompt = self._user_prompt_template()
+
+        # Code inspired by https://stackoverflow.com/questions/3536303/python-string-format-suppress-silent-keyerror-indexerror
+        d = Default({'context': context, 'question': question})
+        return prompt.format_map(d)
+
+    # Load the user prompt template (data/prompts/questions_user.txt, or the default one).
+    def _user_prompt_template(self):
+        return load_prompt(self.user_prompt_path, textwrap.dedent("""
             Voici des extraits de textes de référence sur le tarot :
             
             {context}
@@ -65,20 +84,73 @@ class TarotQuestions:
             {question}
         """), ['context', 'question'])
 
-        # Code inspired by https://stackoverflow.com/questions/3536303/python-string-format-suppress-silent-keyerror-indexerror
-        d = Default({'context': context, 'question': question})
-        return prompt.format_map(d)
-    
-    # Get an answer from the model for the given question.
+    # Key of the answer cache context: retrieved chunk ids, model name and hash of the prompts.
+    def _cache_context(self, results):
+        prompts = f'{self.SYSTEM_PROMPT}\n{self._user_prompt_template()}'
+        prompt_hash = hashlib.sha256(prompts.encode('utf-8')).hexdigest()
+        chunk_ids = results['ids'][0] if results.get('ids') else []
+        return AnswerCache.context_key(chunk_ids, self.model_name, prompt_hash)
+
+    # Retrieve the context of a question and look it up in the answer cache.
+    # Returns the prompt, the cache entry (question embedding, context key; None without cache) and the cached answer or None.
+    def _prepare(self, question):
+        with metrics.timer('rag.retrieve'):
+            results = self.tarot_rag.query_chroma(question, self.n_results)
+            prompt = self._build_prompt(question, results)
+
+        if self.answer_cache is None:
+            return prompt, None, None
+        cache_entry = (self.tarot_rag.embed_question(question), self._cache_context(results))
+        cached = self.answer_cache.get(question, *cache_entry)
+        if cached is not None:
+            metrics.increment('qa.answer_cache_hit')
+        return prompt, cache_entry, cached
+
+    # Get an answer from the model for the given question (or from the answer cache).
     def answer(self, question):
-        prompt = self._build_prompt(question)
-
+        prompt, cache_entry, cached = self._prepare(question)
+        if cached is not None:
+            return cached
+
+        with metrics.timer('llm.answer'):
+            response = chat(self.model_name, 
+                messages=[
+                    {'role': 'system', 'content': self.SYSTEM_PROMPT},
+                    {'role': 'user', 'content': prompt}
+                ])
+        answer = response.message.content
+
+        if cache_entry is not None:
+            self.answer_cache.put(question, *cache_entry, answer)
+        return answer
+
+    # Streamed version of answer() that yields the answer sentence by sentence as it is generated.
+    # The complete answer is cached once the generator is exhausted.
+    def stream_answer(self, question):
+        prompt, cache_entry, cached = self._prepare(question)
+        if cached is not None:
+            yield from stream_sentences([cached])
+            return
+
+        start = time.perf_counter()
         response = chat(self.model_name, 
             messages=[
                 {'role': 'system', 'content': self.SYSTEM_PROMPT},
                 {'role': 'user', 'content': prompt}
-            ])
-        return response.message.content
+            ],
+            stream=True,)
+
+        sentences = []
+        for sentence in stream_sentences(chunk.message.content for chunk in response):
+            if not sentences:
+                metrics.observe('llm.answer_first_sentence', (time.perf_counter() - start) * 1000)
+            sentences.append(sentence)
+            yield sentence
+        # Includes the time the consumer (e.g. TTS) spends between the yields.
+        metrics.observe('llm.answer_stream_total', (time.perf_counter() - start) * 1000)
+
+        if cache_entry is not None:
+            self.answer_cache.put(question, *cache_entry, ''.join(sentences))
 
 if __name__ == '__main__':
     tarot_questions = TarotQuestions()
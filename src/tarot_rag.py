@@ -1,7 +1,13 @@
+import copy
+import hashlib
 import chromadb
 
+from pathlib import Path
+from transformers import AutoTokenizer
 from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
 
+from src.query_cache import QueryCache, normalize_question
+from src.text_chunker import TextChunker
 from src.utils import project_root
 
 class TarotRag:
@@ -10,76 +16,165 @@ class TarotRag:
 
     What it does:
     - Loads tarot reference text files from data/tarot_data/*.txt
-    - Splits them into paragraph-sized chunks
+    - Splits them into token-bounded, overlapping chunks with their section header as metadata (TextChunker)
     - Indexes the chunks into a Chroma collection using a multilingual
       embedding model
     - Provides a simple query method to retrieve the top-N most similar chunks
 
+    The index is updated incrementally: each chunk is stored under the hash of its text, source file
+    and section (id), with the source file and section in the metadata. On startup only the new or
+    edited chunks are embedded (by batches) and the chunks that disappeared from the corpus are
+    deleted, so an unchanged corpus costs a single id listing.
+
+    Queries are cached by normalized question (see normalize_question): the question embedding
+    (LRU of cache_size entries) and the top-n results (LRU with a time to live of cache_ttl seconds,
+    cleared whenever the index changes). Repeated questions then skip the embedding model and Chroma. The collection is rebuilt from scratch if the embedding model or the chunking
+    parameters changed, or on request.
+
     Reference:
     How to Implement RAG with ChromaDB and Ollama: A Python Guide for Beginners:https://medium.com/@arunpatidar26/rag-chromadb-ollama-python-guide-for-beginners-30857499d0a0
     """
 
-    # Initialize Chroma and optionally rebuild the vector index from the text corpus.
-    def __init__(self, rebuild_index = True):
+    EMBEDDING_MODEL = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+    # Initialize Chroma and bring the vector index up to date with the text corpus
+    # (rebuild_index=True drops the collection and re-embeds every chunk).
+    # Chunks hold at most max_tokens model tokens (the model truncates its input at 128 tokens, special tokens included)
+    # with overlap_tokens of overlap; batch_size chunks are embedded and inserted at a time.
+    # cache_size / cache_ttl configure the query caches (cache_size=0 disables them).
+    # data_dir / chroma_dir override the corpus directory (data/tarot_data) and the index directory (data/chroma_tarot).
+    def __init__(self, rebuild_index = False, max_tokens = 126, overlap_tokens = 24, batch_size = 64, cache_size = 128,
+                 cache_ttl = 3600.0, data_dir = None, chroma_dir = None):
         self.embedding_fn = SentenceTransformerEmbeddingFunction(
-            model_name='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+            model_name=self.EMBEDDING_MODEL
         )
-        self.DATA_DIR = project_root() / 'data' / 'tarot_data'
+        self.DATA_DIR = Path(data_dir) if data_dir is not None else project_root() / 'data' / 'tarot_data'
 
-        self.CHROMA_DIR = project_root() / 'data' / 'chroma_tarot'
+        tokenizer = AutoTokenizer.from_pretrained(self.EMBEDDING_MODEL)
+        self.chunker = TextChunker(max_tokens, overlap_tokens,
+                                   count_tokens=lambda text: len(tokenizer(text, add_special_tokens=False)['input_ids']))
+
+        self.CHROMA_DIR = Path(chroma_dir) if chroma_dir is not None else project_root() / 'data' / 'chroma_tarot'
         self.CHROMA_DIR.mkdir(parents=True, exist_ok=True)
         
         self.chroma_client = chromadb.PersistentClient(path=self.CHROMA_DIR)
+        self.batch_size = min(batch_size, self.chroma_client.get_max_batch_size())
+
+        # The embeddings only depend on the model; the results also depend on the index content.
+        self.embedding_cache = QueryCache(cache_size, ttl=float('inf'))
+        self.result_cache = QueryCache(cache_size, ttl=cache_ttl)
 
         self.COLLECTION_NAME = 'tarot-wiki'
         if rebuild_index:
-            try:
-                self.chroma_client.delete_collection(self.COLLECTION_NAME)
-            except Exception:
-                pass
-
-            self.collection = self.chroma_client.create_collection(
-                name=self.COLLECTION_NAME,
-                embedding_function=self.embedding_fn
-            )
-            self._save_chunks_to_chroma()
-        else:
-            try:
-                self.collection = self.chroma_client.get_collection(
-                    name=self.COLLECTION_NAME,
-                    embedding_function=self.embedding_fn,
-                )
-            except Exception:
-                self.collection = self.chroma_client.create_collection(
-                    name=self.COLLECTION_NAME,
-                    embedding_function=self.embedding_fn,
-                )
-                self._save_chunks_to_chroma()
-
-    # Load tarot documents and split them into paragraph chunks.
+            self._delete_collection()
+
+        self.collection = self._get_collection()
+        if (self.collection.metadata or {}).get('chunking') != self._index_version(max_tokens, overlap_tokens):
+            # Embeddings of another model or chunking (or an index built before the chunks were hashed): start over.
+            self._delete_collection()
+            self.collection = self._get_collection()
+
+        self.index_stats = self._sync_chunks_to_chroma()
+
+    # Identifier of the embedding model and chunking parameters the index was built with.
+    def _index_version(self, max_tokens, overlap_tokens):
+        return f'{self.EMBEDDING_MODEL}:{max_tokens}:{overlap_tokens}'
+
+    # Get (or create) the collection, tagged with the embedding model and chunking parameters.
+    def _get_collection(self):
+        return self.chroma_client.get_or_create_collection(
+            name=self.COLLECTION_NAME,
+            embedding_function=self.embedding_fn,
+            metadata={'chunking': self._index_version(self.chunker.max_tokens, self.chunker.overlap_tokens)},
+        )
+
+    # Delete the collection if it exists.
+    def _delete_collection(self):
+        try:
+            self.chroma_client.delete_collection(self.COLLECTION_NAME)
+        except Exception:
+            pass
+
+    # Content hash used as the chunk id (text, source file and section).
+    @staticmethod
+    def chunk_id(text: str, metadata: dict):
+        key = f"{metadata['source']}\n{metadata['section']}\n{text}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    # Stream the chunks of data/tarot_data/*.txt as (id, text, metadata); a chunk present several times is yielded once.
+    def _iter_chunks(self):
+        seen = set()
+        for text, metadata in self.chunker.chunk_files(sorted(self.DATA_DIR.glob('*.txt'))):
+            chunk_id = self.chunk_id(text, metadata)
+            if chunk_id not in seen:
+                seen.add(chunk_id)
+                yield chunk_id, text, metadata
+
+    # Load tarot documents and split them into token-bounded chunks.
     def _load_chunks(self):
-        chunks = []
+        return [text for _, text, _ in self._iter_chunks()]
+
+    # Update the Chroma collection to the current chunks: embed and insert the new ones by batches of batch_size,
+    # then delete the removed ones. Only the ids and one batch are held in memory.
+    # Returns the number of added, deleted and unchanged chunks.
+    def _sync_chunks_to_chroma(self):
+        indexed = set(self.collection.get(include=[])['ids'])
+        current = set()
+        stats = {'added': 0, 'deleted': 0, 'unchanged': 0}
 
-        for file_path in self.DATA_DIR.glob('*.txt'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for paragraph in f.read().split("\n\n"):
-                    if len(paragraph.strip()) > 0:
-                        chunks.append(paragraph.strip())
-        return chunks
+        batch = []
+        for chunk_id, text, metadata in self._iter_chunks():
+            current.add(chunk_id)
+            if chunk_id in indexed:
+                stats['unchanged'] += 1
+                continue
+            batch.append((chunk_id, text, metadata))
+            if len(batch) == self.batch_size:
+                self._add_batch(batch)
+                stats['added'] += len(batch)
+                batch = []
+        if batch:
+            self._add_batch(batch)
+            stats['added'] += len(batch)
 
-    # Save the chunks into the Chroma collection.
-    def _save_chunks_to_chroma(self):
-        chunks = self._load_chunks()
+        deleted = list(indexed - current)
+        for i in range(0, len(deleted), self.batch_size):
+            self.collection.delete(ids=deleted[i:i + self.batch_size])
+        stats['deleted'] = len(deleted)
 
-        ids = [f'idx{i}' for i in range(len(chunks))]
-        self.collection.add(ids=ids, documents=chunks)
+        if stats['added'] or stats['deleted']:
+            self.result_cache.clear()
+        return stats
+
+    # Embed and insert a batch of (id, text, metadata) chunks.
+    def _add_batch(self, batch):
+        self.collection.add(
+            ids=[chunk_id for chunk_id, _, _ in batch],
+            documents=[text for _, text, _ in batch],
+            metadatas=[metadata for _, _, metadata in batch],
+        )
     
+    # Embedding of the normalized question (cached).
+    def embed_question(self, question):
+        question = normalize_question(question)
+        embedding = self.embedding_cache.get(question)
+        if embedding is None:
+            embedding = self.embedding_fn([question])[0]
+            self.embedding_cache.put(question, embedding)
+        return embedding
+
+    # Retrieve the n_results chunks most similar to the question (cached by normalized question).
     def query_chroma(self, question, n_results = 4):
-        results = self.collection.query(
-            query_texts=[question],
-            n_results=n_results
-        )
-        return results
+        question = normalize_question(question)
+        results = self.result_cache.get((question, n_results))
+        if results is None:
+            results = self.collection.query(
+                query_embeddings=[self.embed_question(question)],
+                n_results=n_results
+            )
+            self.result_cache.put((question, n_results), results)
+        # Callers get their own copy of the cached results.
+        return copy.deepcopy(results)
 
 if __name__ == '__main__':
     tarot_rag = TarotRag()
@@ -1,9 +1,10 @@
 import textwrap
-import re
+import time
 
 from ollama import chat
 
-from src.utils import load_prompt, project_root, Default
+from src.metrics import metrics
+from src.utils import load_prompt, project_root, stream_sentences, Default
 
 
 class TarotReader:
@@ -44,11 +45,12 @@ class TarotReader:
         """))
         self.predict(['fake card'])  # Warm-up the model
 
-    # Build the user prompt with the list of drawn cards.
-    def _build_prompt(self, cards: list[str]):
+    # Build the user prompt with the list of drawn cards; reversed_cards flags the cards drawn upside down.
+    def _build_prompt(self, cards: list[str], reversed_cards: list[bool] = None):
+        reversed_cards = reversed_cards or [False] * len(cards)
         cards_desc = ''
-        for card in cards:
-            cards_desc += f'- {card}\n'
+        for card, reversed_card in zip(cards, reversed_cards):
+            cards_desc += f"- {card}, à l'envers\n" if reversed_card else f'- {card}\n'
 
         prompt = load_prompt(self.user_prompt_path, textwrap.dedent("""
             Voici le tirage (de gauche à droite) :
@@ -56,7 +58,7 @@ class TarotReader:
             {cards_desc}
 
             Donne une interprétation globale en français qui :
-              - reste cohérente avec les significations classiques de ces cartes,
+              - reste cohérente avec les significations classiques de ces cartes (sens renversé pour une carte à l'envers),
               - relie les cartes entre elles dans une même idée (pas une explication technique),
               - se limite strictement à 2 ou 3 phrases,
               - inclut au moins une allusion explicite aux cartes (par exemple en les nommant
@@ -71,20 +73,22 @@ class TarotReader:
         return prompt.format_map(d)
 
     # Get an answer from the model for the given list of cards.
-    def predict(self, cards: list[str]):
-        prompt = self._build_prompt(cards)
-
-        response = chat(self.model_name, 
-            messages=[
-                {'role': 'system', 'content': self.SYSTEM_PROMPT},
-                {'role': 'user', 'content': prompt}
-            ])
+    def predict(self, cards: list[str], reversed_cards: list[bool] = None):
+        prompt = self._build_prompt(cards, reversed_cards)
+
+        with metrics.timer('llm.reading'):
+            response = chat(self.model_name, 
+                messages=[
+                    {'role': 'system', 'content': self.SYSTEM_PROMPT},
+                    {'role': 'user', 'content': prompt}
+                ])
         return response.message.content
 
     # Streamed version of predict() that yields partial results as they arrive.
-    def stream_predict(self, cards: list[str]):
-        prompt = self._build_prompt(cards)
+    def stream_predict(self, cards: list[str], reversed_cards: list[bool] = None):
+        prompt = self._build_prompt(cards, reversed_cards)
 
+        start = time.perf_counter()
         response = chat(self.model_name, 
             messages=[
                 {'role': 'system', 'content': self.SYSTEM_PROMPT},
@@ -93,15 +97,15 @@ class TarotReader:
             stream=True,)
         
         print('=== Réponse du modèle ===')
-        sentence = ''
-        for chunk in response:
-            sentence += chunk.message.content
-            print(chunk.message.content, end='', flush=True)
-
-            if any(c in sentence for c in '.:?!'):
-                yield sentence
-                sentence = re.split(r'[\.\:\?\!]', sentence)[-1]
-        yield sentence
+        first_sentence = True
+        for sentence in stream_sentences((chunk.message.content for chunk in response), echo=True):
+            if first_sentence:
+                # Time to the first complete sentence (what the TTS waits for).
+                metrics.observe('llm.first_sentence', (time.perf_counter() - start) * 1000)
+                first_sentence = False
+            yield sentence
+        # Includes the time the consumer (e.g. TTS) spends between the yields.
+        metrics.observe('llm.stream_total', (time.perf_counter() - start) * 1000)
 
 if __name__ == '__main__':
     from src.tts import TTS
@@ -0,0 +1,118 @@
+import re
+
+from pathlib import Path
+from typing import Callable, Iterable
+
+
+class TextChunker:
+    """
+    Streaming chunker for the RAG corpus (plain text files, paragraphs separated by blank lines).
+
+    - Files are read line by line, so memory stays bounded by one section, whatever the file size.
+    - Section headers (a short first line without final punctuation, as in the Wikipedia text
+      exports) are not embedded: they are kept as the 'section' metadata of the following chunks.
+    - Within a section, sentences (and list lines) are packed into windows of at most max_tokens
+      tokens, so that no chunk is truncated by the embedding model. Consecutive windows share about
+      overlap_tokens tokens of whole sentences. A sentence longer than max_tokens is cut on words.
+    - Windows never span two sections.
+
+    count_tokens defaults to a word/punctuation count; pass the embedding model tokenizer for exact bounds.
+    """
+
+    SENTENCE_END = re.compile(r'(?<=[.!?…;])\s+')
+    HEADER_MAX_LENGTH = 80
+
+    # Set the window size and overlap (in tokens) and the token counting function.
+    def __init__(self, max_tokens: int = 120, overlap_tokens: int = 20, count_tokens: Callable[[str], int] = None):
+        if max_tokens <= 0 or not 0 <= overlap_tokens < max_tokens:
+            raise ValueError('max_tokens must be positive and overlap_tokens in [0, max_tokens)')
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens or self.approximate_token_count
+
+    # Approximate token count: words and punctuation marks.
+    @staticmethod
+    def approximate_token_count(text: str) -> int:
+        return len(re.findall(r'\w+|[^\w\s]', text))
+
+    # Yield the paragraphs of a text file (lists of non-empty lines), reading it line by line.
+    @staticmethod
+    def _paragraphs(file_path: Path):
+        lines = []
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    lines.append(line)
+                elif lines:
+                    yield lines
+                    lines = []
+        if lines:
+            yield lines
+
+    # Whether a paragraph line looks like a section header.
+    def _is_header(self, line: str) -> bool:
+        return len(line) <= self.HEADER_MAX_LENGTH and line[-1] not in '.:;!?,'
+
+    # Split a line into units of at most max_tokens tokens (sentences, or word runs for very long sentences).
+    def _units(self, line: str):
+        for sentence in self.SENTENCE_END.split(line):
+            tokens = self.count_tokens(sentence)
+            if tokens <= self.max_tokens:
+                yield sentence, tokens
+                continue
+            words, piece_tokens = [], 0
+            for word in sentence.split():
+                word_tokens = self.count_tokens(word)
+                if words and piece_tokens + word_tokens > self.max_tokens:
+                    yield ' '.join(words), piece_tokens
+                    words, piece_tokens = [], 0
+                words.append(word)
+                piece_tokens += word_tokens
+            if words:
+                yield ' '.join(words), piece_tokens
+
+    # Pack units (text, tokens) into overlapping windows of at most max_tokens tokens.
+    def _windows(self, units: Iterable):
+        window, window_tokens = [], 0
+        for unit in units:
+            if window and window_tokens + unit[1] > self.max_tokens:
+                yield ' '.join(text for text, _ in window)
+                # Keep the last sentences as overlap, as long as the new unit still fits.
+                keep, keep_tokens = [], 0
+                for previous in reversed(window):
+                    if keep_tokens + previous[1] > self.overlap_tokens or keep_tokens + previous[1] + unit[1] > self.max_tokens:
+                        break
+                    keep.insert(0, previous)
+                    keep_tokens += previous[1]
+                window, window_tokens = keep, keep_tokens
+            window.append(unit)
+            window_tokens += unit[1]
+        if window:
+            yield ' '.join(text for text, _ in window)
+
+    # Yield the sections of a file: (section header, lines of the section).
+    def _sections(self, file_path: Path):
+        section, lines = '', []
+        for paragraph in self._paragraphs(file_path):
+            if self._is_header(paragraph[0]) and (len(paragraph) > 1 or lines):
+                if lines:
+                    yield section, lines
+                section, lines = paragraph[0], []
+                paragraph = paragraph[1:]
+            lines.extend(paragraph)
+        if lines:
+            yield section, lines
+
+    # Yield the chunks of a file as (text, metadata) with metadata = {'source': file name, 'section': header}.
+    def chunk_file(self, file_path: Path):
+        file_path = Path(file_path)
+        for section, lines in self._sections(file_path):
+            units = (unit for line in lines for unit in self._units(line))
+            for text in self._windows(units):
+                yield text, {'source': file_path.name, 'section': section}
+
+    # Yield the chunks of several files, one file after the other.
+    def chunk_files(self, file_paths: Iterable[Path]):
+        for file_path in file_paths:
+            yield from self.chunk_file(file_path)
@@ -1,8 +1,10 @@
+import time
 import numpy as np
 import sounddevice as sd
 
 from piper import PiperVoice, SynthesisConfig
 
+from src.metrics import metrics
 from src.utils import project_root
 
 
@@ -32,16 +34,26 @@ class TTS():
         )
 
     # Synthesize and play the given text out loud.
-    def speak(self, text):
+    # on_audio_start (optional) is called right before the first audio chunk is played.
+    def speak(self, text, on_audio_start=None):
         # This code is inspired by https://noerguerra.com/how-to-read-text-aloud-with-piper-and-python/
+        start = time.perf_counter()
         stream = sd.OutputStream(samplerate=self.voice.config.sample_rate, channels=1, dtype='int16')
         stream.start()
 
+        first_chunk = True
         for chunk in self.voice.synthesize(text, syn_config=self.PREDICTION_CONFIG):
+            if first_chunk:
+                # Synthesis latency: time until the first audio chunk is ready to play.
+                metrics.observe('tts.first_chunk', (time.perf_counter() - start) * 1000)
+                first_chunk = False
+                if on_audio_start is not None:
+                    on_audio_start()
             audio = np.frombuffer(chunk.audio_int16_bytes, dtype=np.int16)
             stream.write(audio)
         stream.stop()
         stream.close()
+        metrics.observe('tts.speak', (time.perf_counter() - start) * 1000)
 
 if __name__ == '__main__':
     tts = TTS()
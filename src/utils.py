@@ -1,3 +1,4 @@
+import re
 import sys
 import json
 
@@ -6,7 +7,15 @@ from pathlib import Path
 
 # Default configuration values used when no settings file is found or it is invalid.
 DEFAULT_SETTINGS = {
-    'camera_index': 0
+    'camera_index': 0,
+    'recognition_workers': 1,
+    'detect_max_dim': None,
+    'sift_workers': 1,
+    'embedding_threads': None,
+    'opencv_threads': None,
+    'early_exit_margin': None,
+    'metrics': False,
+    'metrics_dump_period': 10.0
 }
 
 # Dict helper that prevents KeyError in str.format_map by leaving unknown placeholders untouched.
@@ -32,6 +41,26 @@ def load_prompt(file_path: Path, default_prompt: str, parameters = None):
         pass
     return default_prompt.strip()
 
+# End of a sentence in streamed text: a run of '.', ':', '?' or '!'.
+SENTENCE_END = re.compile(r'[.:?!]+')
+
+# Group streamed text pieces (e.g. LLM tokens) into sentences ending with '.', ':', '?' or '!', each yielded as soon as
+# it is complete; the text after the last sentence end is yielded at the end. With echo=True the pieces are printed as they arrive.
+def stream_sentences(pieces, echo = False):
+    sentence = ''
+    for piece in pieces:
+        sentence += piece
+        if echo:
+            print(piece, end='', flush=True)
+
+        match = SENTENCE_END.search(sentence)
+        while match is not None:
+            yield sentence[:match.end()]
+            sentence = sentence[match.end():]
+            match = SENTENCE_END.search(sentence)
+    if sentence.strip():
+        yield sentence
+
 # Load application settings from data/settings.json, falling back to defaults as needed.
 def load_settings():
     settings = project_root() / 'data' / 'settings.json'
@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.answer_cache import AnswerCache
+
+
+def embedding(*values):
+    return np.array(values, dtype=np.float32)
+
+def test_exact_and_normalized_question_hit(tmp_path):
+    cache = AnswerCache(tmp_path / 'answers.sqlite')
+    context = AnswerCache.context_key(['a', 'b'], 'model', 'prompt')
+    cache.put('Combien de cartes ?', embedding(1, 0), context, '78 cartes.')
+
+    assert cache.get('combien de cartes', None, context) == '78 cartes.'
+    assert cache.get('Combien de cartes ?', embedding(0, 1), context) == '78 cartes.'
+
+def test_context_must_match(tmp_path):
+    cache = AnswerCache(tmp_path / 'answers.sqlite')
+    cache.put('Combien de cartes ?', embedding(1, 0), AnswerCache.context_key(['a', 'b'], 'model', 'prompt'), '78 cartes.')
+
+    assert cache.get('Combien de cartes ?', embedding(1, 0), AnswerCache.context_key(['a', 'c'], 'model', 'prompt')) is None
+    assert cache.get('Combien de cartes ?', embedding(1, 0), AnswerCache.context_key(['a', 'b'], 'other', 'prompt')) is None
+    assert cache.get('Combien de cartes ?', embedding(1, 0), AnswerCache.context_key(['a', 'b'], 'model', 'new')) is None
+
+def test_paraphrase_hit_by_embedding(tmp_path):
+    cache = AnswerCache(tmp_path / 'answers.sqlite', similarity=0.9)
+    context = AnswerCache.context_key(['a'], 'model', 'prompt')
+    cache.put('Combien de cartes ?', embedding(1, 0), context, '78 cartes.')
+
+    assert cache.get('Le tarot a combien de cartes ?', embedding(0.95, 0.1), context) == '78 cartes.'
+    assert cache.get('Que signifie le Mat ?', embedding(0.3, 0.95), context) is None
+
+def test_persistence_and_eviction(tmp_path):
+    path = tmp_path / 'answers.sqlite'
+    cache = AnswerCache(path, max_entries=2)
+    context = AnswerCache.context_key(['a'], 'model', 'prompt')
+    cache.put('question 1', embedding(1, 0, 0), context, 'réponse 1')
+    cache.put('question 2', embedding(0, 1, 0), context, 'réponse 2')
+    # Using question 1 makes question 2 the least recently used one.
+    assert cache.get('question 1', None, context) == 'réponse 1'
+    cache.put('question 3', embedding(0, 0, 1), context, 'réponse 3')
+    cache.close()
+
+    cache = AnswerCache(path, max_entries=2)
+    assert len(cache) == 2
+    assert cache.get('question 1', None, context) == 'réponse 1'
+    assert cache.get('question 2', None, context) is None
+    assert cache.get('question 3', None, context) == 'réponse 3'
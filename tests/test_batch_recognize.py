@@ -0,0 +1,48 @@
+import io
+import json
+import pytest
+
+from pathlib import Path
+
+from src.batch_recognize import BatchRecognizer
+from src.card_extractor import CardExtractor
+from src.card_recognizer import CardRecognizer
+
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+IMG_TEST_DIR = DATA_DIR / 'img_test'
+
+def test_batch_recognize_streams_jsonl(tmp_path):
+    (tmp_path / 'broken.jpg').write_bytes(b'not an image')
+    paths = BatchRecognizer.image_paths(IMG_TEST_DIR) + [tmp_path / 'broken.jpg']
+    batch = BatchRecognizer(DATA_DIR / 'cards_test', num_workers=2, recognizer_kwargs={'cache_dir': tmp_path / 'cache'})
+
+    output = io.StringIO()
+    stats = batch.write_jsonl(paths, output)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    assert [r['image'] for r in records] == [str(p) for p in paths]
+    assert stats['images'] == len(paths) and stats['errors'] == 1
+    assert 'error' in records[-1]
+    for path, record in zip(paths[:-1], records[:-1]):
+        assert len(record['cards']) == len(CardExtractor.from_file(str(path)).get_cards())
+        assert all(len(card['box']) == 4 and len(card['matches']) == 3 for card in record['cards'])
+        assert all(card['source'] == 'sift' for card in record['cards'])
+        assert record['timings_ms']['total'] >= record['timings_ms']['recognize']
+
+def test_in_process_run_builds_one_recognizer(tmp_path, monkeypatch):
+    built = []
+    monkeypatch.setattr('src.batch_recognize.CardRecognizer',
+                        lambda *args, **kwargs: built.append(kwargs) or CardRecognizer(*args, **kwargs))
+    batch = BatchRecognizer(DATA_DIR / 'cards_test', num_workers=0, recognizer_kwargs={'cache_dir': tmp_path / 'cache'})
+    records = list(batch.run(BatchRecognizer.image_paths(IMG_TEST_DIR)[:2]))
+    assert len(built) == 1 and all('cards' in record for record in records)
+    assert built[0]['embedding_threads'] is None
+
+def test_cache_fill_keeps_torch_threads(tmp_path):
+    torch = pytest.importorskip('torch')
+    threads = torch.get_num_threads()
+    batch = BatchRecognizer(DATA_DIR / 'cards_test', num_workers=1, recognizer_kwargs={'cache_dir': tmp_path / 'cache'})
+    batch._fill_cache()
+    assert torch.get_num_threads() == threads
+    assert (tmp_path / 'cache' / 'manifest.json').is_file()
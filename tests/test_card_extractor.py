@@ -1,7 +1,10 @@
+import cv2
 import pytest
+import numpy as np
 
 from pathlib import Path
 
+from src.card import Card
 from src.card_extractor import CardExtractor
 
 
@@ -24,6 +27,64 @@ def test_number_cards_extracted(filename, expected_count):
     cards = CardExtractor.from_file(IMG_TEST_DIR / filename).get_cards()
     assert len(cards) == expected_count
 
+@pytest.mark.parametrize('detect_max_dim', [1280, 1024, 800])
+@pytest.mark.parametrize(
+    'filename, expected_count',
+    [
+        ('img1.jpg', 2),
+        ('img2.jpg', 5),
+        ('img3.jpg', 4),
+        ('img4.jpg', 1),
+        ('img5.jpg', 3),
+        ('img6.jpg', 4),
+        ('img7.jpg', 5),
+    ],
+)
+def test_number_cards_extracted_downscaled(filename, expected_count, detect_max_dim):
+    cards = CardExtractor.from_file(IMG_TEST_DIR / filename, detect_max_dim=detect_max_dim).get_cards()
+    assert len(cards) == expected_count
+
+def test_downscaled_boxes_match_full_resolution():
+    full_cards = CardExtractor.from_file(IMG_TEST_DIR / 'img3.jpg').get_cards()
+    small_cards = CardExtractor.from_file(IMG_TEST_DIR / 'img3.jpg', detect_max_dim=800).get_cards()
+
+    for card in small_cards:
+        assert card.image.shape == (600, 300, 3)
+        distances = [np.linalg.norm(card.box[:, None] - c.box[None], axis=2).min(axis=1).max() for c in full_cards]
+        assert min(distances) < 15
+
+@pytest.mark.parametrize('filename', ['img1.jpg', 'img3.jpg', 'img7.jpg'])
+def test_hints_search_only_previous_regions(filename):
+    full_cards = CardExtractor.from_file(IMG_TEST_DIR / filename).get_cards()
+
+    extractor = CardExtractor.from_file(IMG_TEST_DIR / filename)
+    cards = extractor.get_cards(hints=[c.box for c in full_cards])
+    assert not extractor.full_scan
+    assert len(cards) == len(full_cards)
+    for card in cards:
+        assert max(Card.box_iou(card.box, c.box) for c in full_cards) > 0.95
+
+def test_hints_fall_back_to_full_scan_when_card_missing():
+    full_cards = CardExtractor.from_file(IMG_TEST_DIR / 'img5.jpg').get_cards()
+    missing = np.float32([[10, 10], [10, 110], [60, 110], [60, 10]])
+
+    extractor = CardExtractor.from_file(IMG_TEST_DIR / 'img5.jpg')
+    cards = extractor.get_cards(hints=[full_cards[0].box, missing])
+    assert extractor.full_scan
+    assert len(cards) == len(full_cards)
+
+def test_nested_boxes_keep_outermost():
+    mask = np.zeros((1000, 1000), np.uint8)
+    for k, (x, y) in enumerate([(50, 50), (600, 100)]):
+        for inset in range(0, 150, 30):
+            color = 255 if inset % 60 == 0 else 0
+            cv2.rectangle(mask, (x + inset, y + inset), (x + 300 - inset, y + 600 - inset), color, -1)
+    cv2.line(mask, (0, 900), (999, 905), 255, 3)
+
+    boxes = CardExtractor(np.zeros((1000, 1000, 3), np.uint8))._extract_boxes(mask)
+    assert len(boxes) == 2
+    assert sorted(int(b[:, 0, 0].min()) for b in boxes) == [50, 600]
+
 def test_init_raises_on_none_image():
     with pytest.raises(ValueError):
         CardExtractor(img=None)
@@ -32,3 +93,9 @@ def test_from_file_raises_on_missing_file():
     img_path = IMG_TEST_DIR / 'does_not_exist.jpg'
     with pytest.raises(ValueError):
         CardExtractor.from_file(str(img_path))
+
+def test_card_boxes_start_on_image_top_side():
+    for img_path in sorted(IMG_TEST_DIR.glob('*.jpg')):
+        for card in CardExtractor.from_file(str(img_path)).get_cards():
+            box = card.box.reshape(4, 2)
+            assert box[0][1] + box[3][1] <= box[1][1] + box[2][1]
@@ -1,4 +1,7 @@
+import cv2
+import shutil
 import pytest
+import numpy as np
 
 from pathlib import Path
 
@@ -10,6 +13,10 @@ DATA_DIR = Path(__file__).parent.parent / 'data'
 IMG_TEST_DIR = DATA_DIR / 'img_test'
 card_recognizer = CardRecognizer(DATA_DIR / 'cards_test')
 
+@pytest.fixture(scope='module')
+def inverted_recognizer():
+    return CardRecognizer(DATA_DIR / 'cards_test', mode='inverted_index')
+
 #TODO Repair
 @pytest.mark.parametrize(
     'filename, expected_cards',
@@ -60,4 +67,253 @@ def test_recognize_top_k():
 
     results = card_recognizer.recognize(cards[0].image, top_k=top_k)
     assert len(results) == top_k
-    
\ No newline at end of file
+
+def test_reference_cache_reused(tmp_path):
+    recognizer = CardRecognizer(DATA_DIR / 'cards_test', cache_dir=tmp_path)
+    assert set(recognizer.cache.load()) == set(recognizer.ref_labels)
+
+    reloaded = CardRecognizer(DATA_DIR / 'cards_test', cache_dir=tmp_path)
+    assert list(reloaded.ref_labels) == list(recognizer.ref_labels)
+    assert np.allclose(reloaded.ref_embeddings, recognizer.ref_embeddings)
+    for (_, desc), (_, reloaded_desc) in zip(recognizer.ref_sift, reloaded.ref_sift):
+        assert len(reloaded_desc) == len(desc)
+
+def test_reference_cache_only_recomputes_changed(tmp_path, monkeypatch):
+    ref_dir = tmp_path / 'cards'
+    ref_dir.mkdir()
+    for name in ['p_r.jpg', 'co_9.jpg', 't_v.jpg']:
+        shutil.copy(DATA_DIR / 'cards_test' / name, ref_dir / name)
+    CardRecognizer(ref_dir, cache_dir=tmp_path / 'cache')
+
+    shutil.copy(DATA_DIR / 'cards_test' / 'ca_a.jpg', ref_dir / 'co_9.jpg')
+    (ref_dir / 't_v.jpg').unlink()
+
+    calls = []
+    original = CardRecognizer._reference_embeddings
+    def counting(self, img):
+        calls.append(img)
+        return original(self, img)
+    monkeypatch.setattr(CardRecognizer, '_reference_embeddings', counting)
+
+    recognizer = CardRecognizer(ref_dir, cache_dir=tmp_path / 'cache')
+    assert len(calls) == 1
+    assert set(recognizer.ref_labels) == {'p_r', 'co_9'}
+    assert set(recognizer.cache.load()) == {'p_r', 'co_9'}
+
+def test_reference_embedding_matrix():
+    embeddings = card_recognizer.ref_embeddings
+    assert embeddings.dtype == np.float32
+    assert embeddings.flags['C_CONTIGUOUS']
+    assert embeddings.shape[0] == len(card_recognizer.ref_labels) == len(card_recognizer.ref_sift)
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-5)
+
+def test_recognize_batch_single_forward_pass(monkeypatch):
+    img_path = IMG_TEST_DIR / 'img5.jpg'
+    cards = CardExtractor.from_file(str(img_path)).get_cards()
+    images = [card.image for card in cards]
+    expected = [card_recognizer.recognize(image, top_k=2) for image in images]
+
+    calls = []
+    backend = card_recognizer.backend
+    monkeypatch.setattr(card_recognizer, 'backend', lambda batch: calls.append(len(batch)) or backend(batch))
+    results = card_recognizer.recognize_batch(images, top_k=2)
+
+    assert calls == [len(images)]
+    assert [[label for label, _ in r] for r in results] == [[label for label, _ in r] for r in expected]
+    assert card_recognizer.recognize_batch([]) == []
+
+def test_flann_matcher_matches_bf_labels():
+    flann_recognizer = CardRecognizer(DATA_DIR / 'cards_test', matcher='flann')
+    assert len(flann_recognizer.ref_matchers) == len(flann_recognizer.ref_labels)
+
+    for filename in ['img1.jpg', 'img4.jpg', 'img5.jpg']:
+        cards = CardExtractor.from_file(str(IMG_TEST_DIR / filename)).get_cards()
+        images = [card.image for card in cards]
+        bf_results = card_recognizer.recognize_batch(images)
+        flann_results = flann_recognizer.recognize_batch(images)
+        assert [r[0][0] for r in flann_results] == [r[0][0] for r in bf_results]
+
+# FLANN is approximate: ratio-test scores stay within a tolerance of brute force (tight with many checks) and are reproducible.
+def test_flann_scores_match_bf_within_tolerance():
+    flann_recognizer = CardRecognizer(DATA_DIR / 'cards_test', matcher='flann')
+    queries = [card_recognizer._img_to_sift(card.image) for filename in ['img1.jpg', 'img4.jpg', 'img5.jpg']
+               for card in CardExtractor.from_file(str(IMG_TEST_DIR / filename)).get_cards()]
+    refs = range(len(card_recognizer.ref_labels))
+
+    def scores(recognizer):
+        return np.array([[recognizer._sift_score(kp, desc, idx) for idx in refs] for kp, desc in queries])
+
+    bf_scores = scores(card_recognizer)
+    flann_scores = scores(flann_recognizer)
+    diff = np.abs(flann_scores - bf_scores)
+    assert diff.mean() <= 1.5 and diff.max() <= 15
+    assert np.array_equal(scores(CardRecognizer(DATA_DIR / 'cards_test', matcher='flann')), flann_scores)
+
+    precise = CardRecognizer(DATA_DIR / 'cards_test', matcher='flann', flann_trees=4, flann_checks=512)
+    assert np.abs(scores(precise) - bf_scores).max() <= 1.0
+
+def test_invalid_matcher_raises():
+    with pytest.raises(ValueError):
+        CardRecognizer(DATA_DIR / 'cards_test', matcher='unknown')
+
+@pytest.mark.parametrize(
+    'filename, expected_cards',
+    [
+        ('img1.jpg', ['p_r', 'co_9']),
+        ('img4.jpg', ['t_v']),
+        ('img6.jpg', ['p_v', 'p_d', 'co_a', 't_6']),
+        ('img7.jpg', ['p_10', 'ca_7', 'ca_v', 'p_r', 'ca_r']),
+    ],
+)
+def test_inverted_index_mode_recognition(filename, expected_cards, inverted_recognizer):
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / filename)).get_cards()
+    results = inverted_recognizer.recognize_batch([card.image for card in cards], top_k=3, with_source=True)
+    assert all(len(r) == 3 for r in results)
+    assert sorted(r[0][0] for r in results) == sorted(expected_cards)
+    assert all(source == 'inverted_index' and 0.0 <= score <= 100.0 for r in results for _, score, source in r)
+
+def test_inverted_index_scores_references(inverted_recognizer):
+    index = inverted_recognizer.sift_index
+    for idx in [0, 10, 20]:
+        scores = index.score(inverted_recognizer.ref_sift[idx][1])
+        assert scores.shape == (len(inverted_recognizer.ref_labels),)
+        assert scores.argmax() == idx
+
+def test_onnx_backend_matches_torch(tmp_path):
+    pytest.importorskip('onnxruntime')
+    onnx_recognizer = CardRecognizer(DATA_DIR / 'cards_test', use_cache=False, backend='onnx', model_dir=tmp_path)
+    assert (tmp_path / 'resnet18_224x224.onnx').is_file()
+    assert np.allclose(onnx_recognizer.ref_embeddings, card_recognizer.ref_embeddings, atol=1e-4)
+
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img6.jpg')).get_cards()
+    images = [card.image for card in cards]
+    assert ([[label for label, _ in r] for r in onnx_recognizer.recognize_batch(images, top_k=2)] ==
+            [[label for label, _ in r] for r in card_recognizer.recognize_batch(images, top_k=2)])
+
+def test_quantize_requires_onnx_backend():
+    with pytest.raises(ValueError):
+        CardRecognizer(DATA_DIR / 'cards_test', backend='torch', quantize=True)
+
+@pytest.mark.parametrize(
+    'backbone, input_size, dim',
+    [
+        ('mobilenet_v3_small', (112, 112), 576),
+        ('hog_color', (64, 128), 1892),
+    ],
+)
+def test_lightweight_backbones(backbone, input_size, dim):
+    recognizer = CardRecognizer(DATA_DIR / 'cards_test', use_cache=False, backbone=backbone, input_size=input_size)
+    assert recognizer.ref_embeddings.shape == (len(recognizer.ref_labels), dim)
+
+    idx = 5
+    img = cv2.imread(str(recognizer._reference_paths()[idx]))
+    assert recognizer.recognize(img)[0][0] == recognizer.ref_labels[idx]
+
+def test_invalid_backbone_raises():
+    with pytest.raises(ValueError):
+        CardRecognizer(DATA_DIR / 'cards_test', backbone='unknown')
+    with pytest.raises(ValueError):
+        CardRecognizer(DATA_DIR / 'cards_test', backbone='hog_color', backend='onnx')
+
+def test_preprocess_batch_normalizes_and_flips():
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img5.jpg')).get_cards()
+    images = [card.image for card in cards]
+    batch = card_recognizer._preprocess_batch(images, flip=True)
+    assert batch.shape == (2 * len(images), 3, 224, 224)
+    assert batch.dtype == np.float32
+
+    rgb = cv2.cvtColor(cv2.resize(images[0], (224, 224), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+    expected = ((rgb / 255.0 - card_recognizer.mean) / card_recognizer.std).transpose(2, 0, 1)
+    assert np.allclose(batch[0], expected, atol=1e-5)
+    assert np.array_equal(batch[len(images)], batch[0, :, ::-1, ::-1])
+
+def test_parallel_sift_matches_sequential():
+    parallel_recognizer = CardRecognizer(DATA_DIR / 'cards_test', sift_workers=3)
+    for filename in ['img2.jpg', 'img7.jpg']:
+        cards = CardExtractor.from_file(str(IMG_TEST_DIR / filename)).get_cards()
+        images = [card.image for card in cards]
+        assert parallel_recognizer.recognize_batch(images, top_k=3) == card_recognizer.recognize_batch(images, top_k=3)
+    parallel_recognizer.executor.shutdown()
+
+def test_early_exit_skips_sift_when_margin_is_decisive(monkeypatch):
+    recognizer = CardRecognizer(DATA_DIR / 'cards_test', early_exit_margin=0.0)
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img7.jpg')).get_cards()
+    images = [card.image for card in cards]
+
+    calls = []
+    img_to_sift = recognizer._img_to_sift
+    monkeypatch.setattr(recognizer, '_img_to_sift', lambda img: calls.append(img) or img_to_sift(img))
+    results = recognizer.recognize_batch(images, top_k=3, with_source=True)
+    assert calls == []
+    assert all(len(r) == 3 and r[0][1] >= r[1][1] >= r[2][1] for r in results)
+    # Early exit scores are embedding cosine similarities.
+    assert all(source == 'embedding' and -1.0 <= score <= 1.0 for r in results for _, score, source in r)
+
+    recognizer.early_exit_margin = 2.0
+    assert recognizer.recognize_batch(images, top_k=3) == card_recognizer.recognize_batch(images, top_k=3)
+    assert len(calls) == len(images)
+    results = recognizer.recognize_batch(images, top_k=3, with_source=True)
+    assert all(source == 'sift' and 0.0 <= score <= 100.0 for r in results for _, score, source in r)
+
+def test_recognize_orientation():
+    paths = card_recognizer._reference_paths()
+    for idx in [3, 17]:
+        img = cv2.imread(str(paths[idx]))
+        label, _, is_reversed = card_recognizer.recognize(img, with_orientation=True)[0]
+        assert (label, is_reversed) == (paths[idx].stem, False)
+
+        label, _, is_reversed = card_recognizer.recognize(cv2.rotate(img, cv2.ROTATE_180), with_orientation=True)[0]
+        assert (label, is_reversed) == (paths[idx].stem, True)
+
+@pytest.mark.parametrize('features', ['orb', 'akaze'])
+def test_binary_local_features(features, tmp_path):
+    recognizer = CardRecognizer(DATA_DIR / 'cards_test', cache_dir=tmp_path, features=features, matcher='flann')
+    assert all(desc.dtype == np.uint8 and kp.shape == (len(desc), 6) for kp, desc in recognizer.ref_sift)
+
+    reloaded = CardRecognizer(DATA_DIR / 'cards_test', cache_dir=tmp_path, features=features, mode='inverted_index')
+    paths = reloaded._reference_paths()
+    for idx in [2, 30]:
+        img = cv2.imread(str(paths[idx]))
+        assert recognizer.recognize(img)[0][0] == paths[idx].stem
+        assert reloaded.recognize(img)[0][0] == paths[idx].stem
+
+def test_inverted_index_cache_follows_features(tmp_path):
+    sift = CardRecognizer(DATA_DIR / 'cards_test', cache_dir=tmp_path, mode='inverted_index')
+    orb = CardRecognizer(DATA_DIR / 'cards_test', cache_dir=tmp_path, mode='inverted_index', features='orb')
+    assert len(orb.sift_index.ref_words) == sum(len(desc) for _, desc in orb.ref_sift)
+    assert orb.sift_index.vocabulary.shape[1] != sift.sift_index.vocabulary.shape[1]
+
+    img = cv2.imread(str(orb._reference_paths()[5]))
+    assert orb.recognize(img)[0][0] == orb._reference_paths()[5].stem
+
+def test_inverted_index_cache_follows_nfeatures(tmp_path):
+    CardRecognizer(DATA_DIR / 'cards_test', cache_dir=tmp_path, mode='inverted_index')
+    fewer = CardRecognizer(DATA_DIR / 'cards_test', cache_dir=tmp_path, mode='inverted_index', nfeatures=1000)
+    assert len(fewer.sift_index.ref_words) == sum(len(desc) for _, desc in fewer.ref_sift)
+
+    img = cv2.imread(str(fewer._reference_paths()[5]))
+    assert fewer.recognize(img)[0][0] == fewer._reference_paths()[5].stem
+
+def test_geometric_verification_early_stop(monkeypatch):
+    recognizer = CardRecognizer(DATA_DIR / 'cards_test', geometric_verification=True, nfeatures=1000,
+                                num_candidates=6, early_stop_inliers=10)
+    paths = recognizer._reference_paths()
+    img = cv2.rotate(cv2.imread(str(paths[8])), cv2.ROTATE_180)
+
+    calls = []
+    match_count = recognizer._match_count
+    monkeypatch.setattr(recognizer, '_match_count', lambda *args: calls.append(args[2]) or match_count(*args))
+    results = recognizer.recognize(img, top_k=1)
+
+    assert results[0][0] == paths[8].stem
+    assert 2 <= len(calls) < 6
+
+@pytest.mark.parametrize('mode', ['shortlist', 'inverted_index'])
+def test_empty_reference_dir_recognizes_nothing(mode, tmp_path):
+    img = cv2.imread(str(card_recognizer._reference_paths()[0]))
+    (tmp_path / 'empty').mkdir()
+    for ref_dir in [tmp_path / 'empty', tmp_path / 'missing']:
+        recognizer = CardRecognizer(ref_dir, cache_dir=tmp_path / 'cache', mode=mode, matcher='flann')
+        assert recognizer.ref_embeddings.shape[0] == 0
+        assert recognizer.recognize(img) == []
+        assert recognizer.recognize_batch([img, img], with_orientation=True) == [[], []]
@@ -0,0 +1,98 @@
+import numpy as np
+
+from pathlib import Path
+
+from src.card import Card
+from src.card_extractor import CardExtractor
+from src.card_tracker import CardTracker
+
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+IMG_TEST_DIR = DATA_DIR / 'img_test'
+
+class CountingRecognizer:
+    def __init__(self):
+        self.calls = 0
+        self.cards = 0
+
+    def __call__(self, cards):
+        self.calls += 1
+        self.cards += len(cards)
+        for card in cards:
+            card.label, card.confidence = f'card_{int(card.box[0][0])}', 1.0
+
+def copy_cards(cards, offset=(0, 0)):
+    return [Card(box=card.box + np.float32(offset), image=card.image) for card in cards]
+
+def test_stable_cards_are_not_recognized_again():
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img5.jpg')).get_cards()
+    tracker = CardTracker(reverify_frames=100)
+    recognize = CountingRecognizer()
+
+    first = tracker.update(copy_cards(cards), recognize)
+    for _ in range(10):
+        frame_cards = tracker.update(copy_cards(cards), recognize)
+
+    assert recognize.calls == 1
+    assert recognize.cards == len(cards)
+    assert [c.label for c in frame_cards] == [c.label for c in first]
+
+def test_moved_and_new_cards_are_recognized():
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img5.jpg')).get_cards()
+    tracker = CardTracker(reverify_frames=100)
+    recognize = CountingRecognizer()
+
+    tracker.update(copy_cards(cards[:-1]), recognize)
+    moved = copy_cards(cards[:1], offset=(60, 0)) + copy_cards(cards[1:])
+    tracker.update(moved, recognize)
+
+    assert recognize.calls == 2
+    assert recognize.cards == (len(cards) - 1) + 2
+
+def test_cards_are_reverified_periodically():
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img4.jpg')).get_cards()
+    tracker = CardTracker(reverify_frames=5)
+    recognize = CountingRecognizer()
+
+    for _ in range(10):
+        tracker.update(copy_cards(cards), recognize)
+    assert recognize.calls == 2
+
+def test_missing_tracks_are_dropped():
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img4.jpg')).get_cards()
+    tracker = CardTracker(max_missed=2)
+    recognize = CountingRecognizer()
+
+    tracker.update(copy_cards(cards), recognize)
+    for _ in range(3):
+        tracker.update([], recognize)
+    assert tracker.tracks == []
+
+def test_stable_cards_keep_orientation():
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img4.jpg')).get_cards()
+    tracker = CardTracker(reverify_frames=100)
+
+    def recognize(pending):
+        for card in pending:
+            card.label, card.confidence, card.reversed = 't_v', 1.0, True
+
+    tracker.update(copy_cards(cards), recognize)
+    frame_cards = tracker.update(copy_cards(cards), lambda pending: None)
+    assert [c.reversed for c in frame_cards] == [True] * len(cards)
+
+def test_prepare_and_apply_split_the_update():
+    cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img5.jpg')).get_cards()
+    tracker = CardTracker(reverify_frames=100)
+    recognize = CountingRecognizer()
+
+    frame_cards = copy_cards(cards)
+    plan, pending = tracker.prepare(frame_cards)
+    # Nothing is tracked until the frame is applied, so recognition can run without the caller's lock.
+    assert len(pending) == len(cards)
+    assert tracker.tracks == []
+
+    recognize(pending)
+    tracker.apply(frame_cards, plan)
+    _, pending = tracker.prepare(copy_cards(cards))
+    assert pending == []
+    assert len(tracker.current_boxes()) == len(cards)
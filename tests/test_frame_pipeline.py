@@ -0,0 +1,82 @@
+import time
+import threading
+import numpy as np
+
+from src.frame_pipeline import FramePipeline, LatestQueue
+
+
+class FakeCamera:
+    def __init__(self, num_frames, delay=0.001):
+        self.num_frames = num_frames
+        self.delay = delay
+        self.index = 0
+
+    def read(self):
+        time.sleep(self.delay)
+        if self.index >= self.num_frames:
+            return False, None
+        frame = np.full((4, 4), self.index, dtype=np.int32)
+        self.index += 1
+        return True, frame
+
+def test_latest_queue_drops_oldest():
+    queue = LatestQueue(maxsize=2)
+    for i in range(5):
+        queue.put(i)
+    assert queue.drops == 3
+    assert queue.depth() == 2
+    assert queue.get() == 3
+    assert queue.get() == 4
+    assert queue.get(timeout=0.01) is None
+
+def test_latest_queue_close_wakes_consumers():
+    queue = LatestQueue()
+    results = []
+    t = threading.Thread(target=lambda: results.append(queue.get()))
+    t.start()
+    queue.close()
+    t.join(timeout=1)
+    assert results == [None]
+
+def test_pipeline_capture_is_not_blocked_by_slow_recognition():
+    camera = FakeCamera(num_frames=100)
+
+    def process(frame, seq):
+        time.sleep(0.02)
+        return int(frame[0, 0])
+
+    pipeline = FramePipeline(camera.read, process, num_workers=2)
+    pipeline.start()
+    while pipeline.running:
+        pipeline.get_display_frame(timeout=0.01)
+    pipeline.stop()
+
+    stats = pipeline.stats()
+    assert stats['capture']['frames'] == 100
+    assert stats['recognition']['processed'] < 100
+    assert stats['recognition']['drops'] > 0
+    assert stats['recognition']['processed'] + stats['recognition']['drops'] + stats['recognition']['depth'] <= 100
+
+    seq, result = pipeline.latest_results()
+    assert result == seq
+
+def test_display_drawing_does_not_alter_recognized_frames():
+    camera = FakeCamera(num_frames=200)
+    altered = []
+
+    def process(frame, seq):
+        time.sleep(0.002)
+        altered.append(bool((frame == -1).any()))
+        return int(frame[0, 0])
+
+    pipeline = FramePipeline(camera.read, process, num_workers=2)
+    pipeline.start()
+    while pipeline.running:
+        item = pipeline.get_display_frame(timeout=0.01)
+        if item is not None:
+            # The display loop draws on the frame in place.
+            item[1][:] = -1
+    pipeline.stop()
+
+    assert len(altered) > 0
+    assert not any(altered)
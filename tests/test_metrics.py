@@ -0,0 +1,87 @@
+import json
+import numpy as np
+
+from pathlib import Path
+
+from src.card_extractor import CardExtractor
+from src.metrics import Metrics, metrics
+
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+IMG_TEST_DIR = DATA_DIR / 'img_test'
+
+def test_disabled_metrics_record_nothing():
+    m = Metrics()
+    with m.timer('stage'):
+        pass
+    m.observe('other', 1.0)
+    m.increment('events')
+
+    summary = m.summary()
+    assert summary['stages'] == {}
+    assert summary['counters'] == {}
+
+def test_rolling_percentiles():
+    m = Metrics(enabled=True, window=100)
+    for ms in range(200):
+        m.observe('stage', float(ms))
+    m.increment('events', 3)
+
+    stats = m.summary()['stages']['stage']
+    # Only the last 100 values (100..199) are kept, the count covers all of them.
+    assert stats['count'] == 200
+    assert stats['sum'] == sum(range(200))
+    assert stats['p50'] == np.percentile(np.arange(100, 200), 50)
+    assert stats['max'] == 199
+    assert m.summary()['counters'] == {'events': 3}
+
+def test_timer_records_duration():
+    m = Metrics(enabled=True)
+    with m.timer('stage'):
+        sum(range(1000))
+    assert m.summary()['stages']['stage']['count'] == 1
+    assert m.summary()['stages']['stage']['p50'] >= 0
+
+def test_exports(tmp_path):
+    m = Metrics(enabled=True)
+    m.observe('extractor.warp', 2.0)
+    m.observe('extractor.warp', 3.0)
+    m.increment('frames')
+
+    text = m.to_prometheus()
+    assert 'tarot_stage_duration_ms{stage="extractor.warp",quantile="0.5"} 2.5' in text
+    assert 'tarot_stage_duration_ms_sum{stage="extractor.warp"} 5.0' in text
+    assert 'tarot_stage_duration_ms_count{stage="extractor.warp"} 2' in text
+    assert 'tarot_events_total{name="frames"} 1' in text
+
+    m.dump(tmp_path)
+    assert json.loads((tmp_path / 'metrics.json').read_text())['stages']['extractor.warp']['count'] == 2
+    assert (tmp_path / 'metrics.prom').read_text() == text
+
+def test_periodic_dump_writes_on_stop(tmp_path):
+    m = Metrics(enabled=True)
+    m.start_dump(tmp_path, period=60)
+    m.observe('stage', 1.0)
+    m.stop_dump()
+    assert 'stage' in json.loads((tmp_path / 'metrics.json').read_text())['stages']
+
+def test_overlay_draws_on_frame():
+    m = Metrics(enabled=True)
+    m.observe('stage', 1.0)
+    img = np.zeros((100, 400, 3), np.uint8)
+    m.draw_overlay(img)
+    assert img.any()
+
+def test_extractor_stages_are_timed():
+    metrics.reset()
+    metrics.enable()
+    try:
+        cards = CardExtractor.from_file(str(IMG_TEST_DIR / 'img5.jpg')).get_cards()
+        stages = metrics.summary()['stages']
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+
+    assert stages['extractor.preprocess']['count'] == 1
+    assert stages['extractor.extract_boxes']['count'] == 1
+    assert stages['extractor.warp']['count'] == len(cards)
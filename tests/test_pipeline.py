@@ -27,8 +27,8 @@ app.stt.close()
     ],
 )
 def test_card_pipeline_speed(filename, monkeypatch):
-    monkeypatch.setattr(app.tts, 'speak', lambda text: None)
-    monkeypatch.setattr(app.tarot_reader, 'stream_predict', lambda cards: [])
+    monkeypatch.setattr(app.tts, 'speak', lambda text, on_audio_start=None: None)
+    monkeypatch.setattr(app.tarot_reader, 'stream_predict', lambda cards, reversed_cards=None: [])
 
     img_path = IMG_TEST_DIR / filename
     image = cv2.imread(img_path)
@@ -44,3 +44,19 @@ def test_card_pipeline_speed(filename, monkeypatch):
 
     assert mean_time < MAX_TIME_PER_IMAGE
 
+
+def test_older_frames_do_not_roll_the_tracker_back(monkeypatch):
+    monkeypatch.setattr(app.tts, 'speak', lambda *args, **kwargs: None)
+    monkeypatch.setattr(app.tarot_reader, 'stream_predict', lambda *args, **kwargs: [])
+
+    newer = cv2.imread(IMG_TEST_DIR / 'img5.jpg')
+    older = cv2.imread(IMG_TEST_DIR / 'img4.jpg')
+    seq = app.last_applied_seq + 10
+    app._analyze_frame(newer, seq)
+    boxes = app.card_tracker.current_boxes()
+
+    # A worker finishing an older frame after a newer one was applied leaves the tracker unchanged.
+    app._analyze_frame(older, seq - 1)
+    assert app.last_applied_seq == seq
+    assert len(app.card_tracker.current_boxes()) == len(boxes)
+    assert all((a == b).all() for a, b in zip(app.card_tracker.current_boxes(), boxes))
@@ -0,0 +1,46 @@
+from src.query_cache import QueryCache, normalize_question
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_normalize_question():
+    assert normalize_question('  Combien de CARTES ?') == normalize_question('combien de cartes')
+    assert normalize_question("Que signifie l'Arcane sans nom ?") == "que signifie l'arcane sans nom"
+    assert normalize_question('combien de cartes') != normalize_question('combien de couleurs')
+
+def test_lru_eviction():
+    cache = QueryCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    # 'b' is the least recently used entry.
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = QueryCache(ttl=10, clock=clock)
+    cache.put('a', 1)
+    clock.now = 9
+    assert cache.get('a') == 1
+    clock.now = 11
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_clear_and_disabled_cache():
+    cache = QueryCache()
+    cache.put('a', 1)
+    cache.clear()
+    assert cache.get('a') is None
+
+    disabled = QueryCache(max_size=0)
+    disabled.put('a', 1)
+    assert disabled.get('a') is None
@@ -1,11 +1,15 @@
 import pytest
 
+from types import SimpleNamespace
+
+from src.answer_cache import AnswerCache
 from src.tarot_questions import TarotQuestions
 
 
 @pytest.fixture
 def tarot_questions():
-    return TarotQuestions()
+    # The model itself is tested: no cached answers.
+    return TarotQuestions(answer_cache=False)
 
 def test_off_topic_returns(tarot_questions):
     response = tarot_questions.answer('Combien de pattes a une araignée ?').strip()
@@ -22,3 +26,23 @@ def test_tarot_answerable(tarot_questions):
         "Je ne peux pas répondre de façon fiable : je n'ai pas assez d'informations."
     ]
     assert '(' not in response and ')' not in response
+
+def test_repeated_question_is_answered_from_cache(tarot_questions, tmp_path, monkeypatch):
+    tarot_questions.answer_cache = AnswerCache(tmp_path / 'answers.sqlite')
+    first = tarot_questions.answer('Combien y a-t-il de cartes dans un jeu de tarot ?')
+
+    monkeypatch.setattr('src.tarot_questions.chat', lambda *args, **kwargs: pytest.fail('model called again'))
+    assert tarot_questions.answer('combien y a-t-il de cartes dans un jeu de tarot') == first
+
+def test_stream_answer_yields_sentences_and_caches_answer(tarot_questions, tmp_path, monkeypatch):
+    pieces = ['Un jeu', ' de tarot compte', ' 78 cartes.', ' Dont 22', ' atouts.']
+    chunks = [SimpleNamespace(message=SimpleNamespace(content=p)) for p in pieces]
+    monkeypatch.setattr('src.tarot_questions.chat', lambda *args, **kwargs: iter(chunks))
+    tarot_questions.answer_cache = AnswerCache(tmp_path / 'answers.sqlite')
+
+    question = 'Combien y a-t-il de cartes dans un jeu de tarot ?'
+    assert list(tarot_questions.stream_answer(question)) == ['Un jeu de tarot compte 78 cartes.', ' Dont 22 atouts.']
+
+    monkeypatch.setattr('src.tarot_questions.chat', lambda *args, **kwargs: pytest.fail('model called again'))
+    assert tarot_questions.answer(question) == 'Un jeu de tarot compte 78 cartes. Dont 22 atouts.'
+    assert list(tarot_questions.stream_answer(question)) == ['Un jeu de tarot compte 78 cartes.', ' Dont 22 atouts.']
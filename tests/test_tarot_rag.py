@@ -3,10 +3,32 @@ import pytest
 from src.tarot_rag import TarotRag
 
 
+# Small corpus for the tests that modify the index (they never touch data/chroma_tarot).
+CORPUS = {
+    'Tarot_a.txt': (
+        'Le tarot est un jeu de 78 cartes.\n\n'
+        'Histoire\nLe tarot apparaît en Italie au XVe siècle. Il sert d\'abord au jeu.\n\n'
+        'Divination\nLe tarot divinatoire est utilisé pour la cartomancie depuis le XVIIIe siècle.\n'
+    ),
+    'Tarot_b.txt': (
+        'Les arcanes majeurs sont 22 cartes numérotées.\n\n'
+        'Arcanes mineurs\nLes 56 arcanes mineurs se répartissent en quatre couleurs.\n'
+    ),
+}
+
 @pytest.fixture
 def tarot_rag():
     return TarotRag()
 
+# TarotRag indexing the small corpus into a temporary Chroma directory.
+@pytest.fixture
+def isolated_rag(tmp_path):
+    data_dir = tmp_path / 'tarot_data'
+    data_dir.mkdir()
+    for name, text in CORPUS.items():
+        (data_dir / name).write_text(text, encoding='utf-8')
+    return TarotRag(data_dir=data_dir, chroma_dir=tmp_path / 'chroma')
+
 def test_load_chunks(tarot_rag):
     chunks = tarot_rag._load_chunks()
     assert tarot_rag.collection.count() == len(chunks)
@@ -25,3 +47,45 @@ def test_query_is_deterministic(tarot_rag):
     r1 = tarot_rag.query_chroma(q, 4)['documents'][0]
     r2 = tarot_rag.query_chroma(q, 4)['documents'][0]
     assert r1 == r2
+
+def test_unchanged_corpus_is_not_reindexed(tarot_rag):
+    stats = TarotRag().index_stats
+    assert stats['added'] == 0
+    assert stats['deleted'] == 0
+    assert stats['unchanged'] == tarot_rag.collection.count()
+
+def test_only_changed_chunks_are_reindexed(isolated_rag):
+    files = sorted(isolated_rag.DATA_DIR.glob('*.txt'))
+    removed = len(list(isolated_rag.chunker.chunk_file(files[0])))
+    count = isolated_rag.collection.count()
+    assert isolated_rag.index_stats == {'added': count, 'deleted': 0, 'unchanged': 0}
+
+    files[0].unlink()
+    with open(files[1], 'a', encoding='utf-8') as f:
+        f.write('\n\nNouvelle section\nUn nouveau paragraphe sur le tarot.\n')
+
+    stats = isolated_rag._sync_chunks_to_chroma()
+    assert stats == {'added': 1, 'deleted': removed, 'unchanged': count - removed}
+    assert isolated_rag.collection.count() == count - removed + 1
+    new = isolated_rag.collection.get(where={'section': 'Nouvelle section'})
+    assert new['documents'] == ['Un nouveau paragraphe sur le tarot.']
+
+def test_repeated_questions_use_the_cache(tarot_rag, monkeypatch):
+    first = tarot_rag.query_chroma('Combien de cartes il y a au tarot ?', 4)
+    monkeypatch.setattr(tarot_rag, 'embedding_fn', lambda texts: pytest.fail('question embedded again'))
+    hits = tarot_rag.result_cache.hits
+    assert tarot_rag.query_chroma('combien de cartes il y a au tarot', 4) == first
+    assert tarot_rag.result_cache.hits == hits + 1
+
+def test_index_change_clears_cached_results(isolated_rag):
+    isolated_rag.query_chroma('Combien de cartes il y a au tarot', 2)
+    assert len(isolated_rag.result_cache) > 0
+
+    isolated_rag._sync_chunks_to_chroma()
+    assert len(isolated_rag.result_cache) > 0
+
+    for file_path in isolated_rag.DATA_DIR.glob('*.txt'):
+        file_path.unlink()
+    isolated_rag._sync_chunks_to_chroma()
+    assert len(isolated_rag.result_cache) == 0
+    assert isolated_rag.collection.count() == 0
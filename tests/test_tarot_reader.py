@@ -50,4 +50,30 @@ def test_predict_calls_chat(monkeypatch):
 
     for card in cards:
         assert card in user_msg['content']
-    
\ No newline at end of file
+    
+def test_prompt_marks_reversed_cards(monkeypatch):
+    class DummyResponse:
+        def __init__(self, content: str):
+            self.message = SimpleNamespace(content=content)
+
+    monkeypatch.setattr(tarot_reader_module, 'chat', lambda model_name, messages: DummyResponse('fake response'))
+    tarot_reader = TarotReader('llama3.2:3b')
+    prompt = tarot_reader._build_prompt(['le diable', 'la mort'], [True, False])
+
+    assert "- le diable, à l'envers\n" in prompt
+    assert '- la mort\n' in prompt
+
+def test_stream_predict_yields_complete_sentences(monkeypatch):
+    pieces = ['Le Diable', ' annonce', ' un lien. La', ' Mort', ' une fin', ' : un renouveau', '! Courage', '.', ' Fin']
+    chunks = [SimpleNamespace(message=SimpleNamespace(content=p)) for p in pieces]
+
+    # The constructor warms the model up with a non-streamed predict().
+    def mockreturn(model_name, messages, stream=False):
+        return iter(chunks) if stream else SimpleNamespace(message=SimpleNamespace(content='fake response'))
+
+    monkeypatch.setattr(tarot_reader_module, 'chat', mockreturn)
+    tarot_reader = TarotReader('llama3.2:3b')
+    sentences = list(tarot_reader.stream_predict(['le diable', 'la mort']))
+
+    assert sentences == ['Le Diable annonce un lien.', ' La Mort une fin :', ' un renouveau!', ' Courage.', ' Fin']
+    assert ''.join(sentences) == ''.join(pieces)
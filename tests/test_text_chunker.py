@@ -0,0 +1,54 @@
+import pytest
+
+from pathlib import Path
+
+from src.text_chunker import TextChunker
+
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+TAROT_DATA_DIR = DATA_DIR / 'tarot_data'
+
+def write_corpus(tmp_path):
+    file_path = tmp_path / 'corpus.txt'
+    file_path.write_text(
+        'Introduction du texte. Elle parle du tarot.\n\n'
+        'Histoire\n'
+        'Première phrase sur l\'histoire. Deuxième phrase sur les origines. Troisième phrase sur Marseille.\n'
+        'Quatrième phrase sur les atouts.\n\n'
+        'Tirage\n'
+        'Une phrase sur le tirage en croix.\n',
+        encoding='utf-8')
+    return file_path
+
+def test_sections_are_kept_as_metadata(tmp_path):
+    chunks = list(TextChunker(max_tokens=100).chunk_file(write_corpus(tmp_path)))
+    assert [m['section'] for _, m in chunks] == ['', 'Histoire', 'Tirage']
+    assert all(m['source'] == 'corpus.txt' for _, m in chunks)
+    assert 'Histoire' not in chunks[1][0]
+    assert chunks[2][0] == 'Une phrase sur le tirage en croix.'
+
+def test_windows_are_bounded_and_overlap(tmp_path):
+    chunker = TextChunker(max_tokens=14, overlap_tokens=7)
+    chunks = [text for text, m in chunker.chunk_file(write_corpus(tmp_path)) if m['section'] == 'Histoire']
+    assert len(chunks) > 1
+    assert all(chunker.count_tokens(text) <= 14 for text in chunks)
+    # Consecutive windows share their boundary sentence.
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.split('. ')[-1].rstrip('.') in current
+
+def test_long_sentences_are_cut_on_words(tmp_path):
+    file_path = tmp_path / 'long.txt'
+    file_path.write_text(' '.join(['mot'] * 50) + '.\n', encoding='utf-8')
+    chunks = list(TextChunker(max_tokens=10, overlap_tokens=0).chunk_file(file_path))
+    assert all(TextChunker.approximate_token_count(text) <= 10 for text, _ in chunks)
+    assert ' '.join(text for text, _ in chunks).split() == (' '.join(['mot'] * 50) + '.').split()
+
+def test_tarot_corpus_chunks_are_bounded():
+    chunker = TextChunker(max_tokens=120, overlap_tokens=20)
+    chunks = list(chunker.chunk_files(sorted(TAROT_DATA_DIR.glob('*.txt'))))
+    assert len(chunks) > 0
+    assert all(0 < chunker.count_tokens(text) <= 120 for text, _ in chunks)
+
+def test_invalid_overlap():
+    with pytest.raises(ValueError):
+        TextChunker(max_tokens=10, overlap_tokens=10)